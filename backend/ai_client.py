@@ -1,28 +1,63 @@
 import os
 import sys
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 # Ensure environment is loaded from the correct path
 env_path = os.path.join(os.path.dirname(__file__), '.env')
 load_dotenv(env_path)
 
+# Connection pool / timeout settings for the shared async HTTP client.
+# Each Uvicorn worker keeps one pool, so LLM_MAX_CONNECTIONS is the number of
+# LLM calls a single worker can have in flight at once.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 32))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 120))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+
+def _resolve_deepseek_config():
+    """Returns (api_key, base_url) for DeepSeek/OpenRouter, or (None, None) if unset."""
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+
+    if not api_key or not api_key.strip():
+        return None, None
+
+    api_key = api_key.strip()
+    # Default to OpenRouter if the key starts with sk-or-
+    default_url = "https://openrouter.ai/api/v1" if api_key.startswith("sk-or-") else "https://api.deepseek.com/v1"
+    base_url = os.getenv("DEEPSEEK_API_URL", default_url)
+    return api_key, base_url
+
+def _build_async_http_client() -> httpx.AsyncClient:
+    """Builds a pooled keep-alive HTTP client shared by all async LLM calls."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            LLM_READ_TIMEOUT,
+            connect=LLM_CONNECT_TIMEOUT,
+            pool=LLM_POOL_TIMEOUT,
+        ),
+    )
+
 def get_ai_client():
     """
     Returns an initialized OpenAI client for DeepSeek/OpenRouter.
     Ensures environment variables are loaded before initialization.
     """
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    
-    if not api_key or not api_key.strip():
+    api_key, base_url = _resolve_deepseek_config()
+
+    if not api_key:
         print("Warning: DEEPSEEK_API_KEY is missing or empty in .env")
         return None
-        
-    api_key = api_key.strip()
-    # Default to OpenRouter if the key starts with sk-or-
-    default_url = "https://openrouter.ai/api/v1" if api_key.startswith("sk-or-") else "https://api.deepseek.com/v1"
-    base_url = os.getenv("DEEPSEEK_API_URL", default_url)
-    
+
     if api_key.startswith("sk-or-"):
         print("DEBUG: Using OpenRouter API Key")
     else:
@@ -37,6 +72,30 @@ def get_ai_client():
         print(f"Error initializing OpenAI client: {e}")
         return None
 
+def get_async_ai_client():
+    """
+    Returns an AsyncOpenAI client for DeepSeek/OpenRouter backed by a pooled
+    keep-alive HTTP client. Use this from `async def` handlers so LLM calls
+    do not block the event loop.
+    """
+    api_key, base_url = _resolve_deepseek_config()
+    if not api_key:
+        return None
+
+    try:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=_build_async_http_client(),
+            max_retries=LLM_MAX_RETRIES,
+        )
+        client.default_max_tokens = 2000
+        print(f"DEBUG: Async LLM client ready (max_connections={LLM_MAX_CONNECTIONS})")
+        return client
+    except Exception as e:
+        print(f"Error initializing AsyncOpenAI client: {e}")
+        return None
+
 def get_openai_client():
     """
     Returns an initialized OpenAI client specifically for OpenAI's models (Whisper, GPT-4).
@@ -45,7 +104,7 @@ def get_openai_client():
     if not api_key or not api_key.strip():
         print("Warning: OPENAI_API_KEY is missing or empty in .env")
         return None
-    
+
     try:
         client = OpenAI(api_key=api_key.strip())
         client.default_max_tokens = 2000
@@ -54,6 +113,12 @@ def get_openai_client():
         print(f"Error initializing OpenAI client: {e}")
         return None
 
+async def close_ai_clients():
+    """Closes the pooled connections held by the async client."""
+    if async_client:
+        await async_client.close()
+
 # Eager initialization
 client = get_ai_client()
+async_client = get_async_ai_client()
 openai_client = get_openai_client()
@@ -0,0 +1,130 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from database import get_database
+from utils.embedding_batcher import embed_texts
+from utils.embedding_service import embedding_model_name
+
+# Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Cosine similarity between two questions for the stored answer to be reused
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92))
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", 24))
+# Most recent answers per video compared against a new question
+ANSWER_CACHE_SCAN = int(os.getenv("ANSWER_CACHE_SCAN", 200))
+
+# Per-worker counters; the per-document 'hits' field gives the global view
+_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0, "saved_llm_ms": 0.0}
+
+async def embed_question(question: str) -> Optional[List[float]]:
+    """Local embedding of a question, or None if the model is unavailable (the cache is then skipped)."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    try:
+        return (await embed_texts([question], use_openai=False))[0]
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Answer cache embedding failed: {e}")
+        return None
+
+async def get_cached_answer(video_id: str, content_hash: Optional[str], embedding: Optional[List[float]]) -> Optional[Dict]:
+    """
+    Returns the stored answer ({"answer", "sources", "question", "similarity"})
+    to the most similar earlier question about the same index content, if
+    it is similar enough and not expired. A failed lookup returns None,
+    so the question still goes through retrieval.
+    """
+    if embedding is None or not content_hash:
+        return None
+    try:
+        return await _find_cached_answer(video_id, content_hash, embedding)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Answer cache lookup failed: {e}")
+        return None
+
+async def _find_cached_answer(video_id: str, content_hash: str, embedding: List[float]) -> Optional[Dict]:
+    db = await get_database()
+    now = datetime.utcnow()
+    candidates = await db.answer_cache.find(
+        {
+            "video_id": video_id,
+            "content_hash": content_hash,
+            "model": embedding_model_name(False),
+            "expires_at": {"$gt": now},
+        },
+        {"embedding": 1}
+    ).sort("created_at", -1).limit(ANSWER_CACHE_SCAN).to_list(length=ANSWER_CACHE_SCAN)
+
+    best, best_similarity = None, ANSWER_CACHE_THRESHOLD
+    if candidates:
+        query = np.asarray(embedding, dtype=np.float32)
+        stored = np.stack([np.frombuffer(doc["embedding"], dtype=np.float32) for doc in candidates])
+        similarities = stored @ query / (np.linalg.norm(stored, axis=1) * np.linalg.norm(query) + 1e-12)
+        index = int(np.argmax(similarities))
+        if similarities[index] >= best_similarity:
+            best, best_similarity = candidates[index], float(similarities[index])
+
+    if best is None:
+        _stats["misses"] += 1
+        return None
+    doc = await db.answer_cache.find_one_and_update(
+        {"_id": best["_id"]},
+        {"$inc": {"hits": 1}, "$set": {"last_hit": now}},
+        projection={"answer": 1, "sources": 1, "question": 1, "llm_ms": 1}
+    )
+    if doc is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    _stats["saved_llm_ms"] += doc.get("llm_ms") or 0
+    return {
+        "answer": doc["answer"],
+        "sources": doc["sources"],
+        "question": doc["question"],
+        "similarity": round(best_similarity, 4),
+    }
+
+async def set_cached_answer(
+    video_id: str,
+    content_hash: Optional[str],
+    embedding: Optional[List[float]],
+    question: str,
+    answer: str,
+    sources: List[Dict],
+    llm_ms: float
+):
+    if embedding is None or not content_hash:
+        return
+    db = await get_database()
+    now = datetime.utcnow()
+    # Answers about an older version of the video's chunks can never match again
+    await db.answer_cache.delete_many({"video_id": video_id, "content_hash": {"$ne": content_hash}})
+    await db.answer_cache.insert_one({
+        "video_id": video_id,
+        "content_hash": content_hash,
+        "model": embedding_model_name(False),
+        "question": question,
+        # float32 bytes: a quarter of the BSON size of a list of doubles
+        "embedding": np.asarray(embedding, dtype=np.float32).tobytes(),
+        "answer": answer,
+        "sources": sources,
+        "llm_ms": round(llm_ms, 1),
+        "hits": 0,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=ANSWER_CACHE_TTL_HOURS),
+    })
+    _stats["stores"] += 1
+
+def get_answer_cache_stats() -> Dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "saved_llm_ms": round(_stats["saved_llm_ms"], 1),
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0,
+        "threshold": ANSWER_CACHE_THRESHOLD,
+        "ttl_hours": ANSWER_CACHE_TTL_HOURS,
+    }
@@ -1,5 +1,8 @@
 import os
+import time
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -12,6 +15,12 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1440))
 
+# bcrypt runs on a dedicated thread pool (it releases the GIL), so a login
+# burst can't stall the event loop. AUTH_HASH_WORKERS caps concurrent hashes;
+# beyond AUTH_HASH_MAX_PENDING queued requests new ones are rejected.
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", 4))
+AUTH_HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", 64))
+
 print(f"DEBUG: auth_utils initialized. SECRET_KEY starts with: {SECRET_KEY[:5]}...")
 
 def verify_password(plain_password, hashed_password):
@@ -20,6 +29,69 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
+class AuthBusyError(Exception):
+    """Raised when too many password hashes are already queued."""
+
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+_hash_stats = {
+    "pending": 0,
+    "max_pending_seen": 0,
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "total_wait": 0.0,
+    "total_run": 0.0,
+}
+
+def _timed(fn, enqueued, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started - enqueued, time.perf_counter() - started
+
+async def _run_hash(fn, *args):
+    if _hash_stats["pending"] >= AUTH_HASH_MAX_PENDING:
+        _hash_stats["rejected"] += 1
+        raise AuthBusyError("Too many authentication requests in progress")
+
+    _hash_stats["pending"] += 1
+    _hash_stats["max_pending_seen"] = max(_hash_stats["max_pending_seen"], _hash_stats["pending"])
+    try:
+        loop = asyncio.get_running_loop()
+        result, wait, run = await loop.run_in_executor(_hash_executor, _timed, fn, time.perf_counter(), *args)
+    except Exception:
+        _hash_stats["failed"] += 1
+        raise
+    finally:
+        _hash_stats["pending"] -= 1
+    # Counters are only touched on the event loop; only successful hashes
+    # are timed, so the averages match "completed"
+    _hash_stats["completed"] += 1
+    _hash_stats["total_wait"] += wait
+    _hash_stats["total_run"] += run
+    return result
+
+async def verify_password_async(plain_password, hashed_password):
+    """verify_password() on the auth executor."""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """get_password_hash() on the auth executor."""
+    return await _run_hash(get_password_hash, password)
+
+def get_auth_executor_stats():
+    completed = _hash_stats["completed"]
+    return {
+        "workers": AUTH_HASH_WORKERS,
+        "max_pending": AUTH_HASH_MAX_PENDING,
+        "pending": _hash_stats["pending"],
+        "max_pending_seen": _hash_stats["max_pending_seen"],
+        "completed": completed,
+        "failed": _hash_stats["failed"],
+        "rejected": _hash_stats["rejected"],
+        "avg_queue_wait_ms": round(_hash_stats["total_wait"] / completed * 1000, 2) if completed else 0,
+        "avg_hash_ms": round(_hash_stats["total_run"] / completed * 1000, 2) if completed else 0,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark for transcript chunking.
+
+Builds a synthetic multi-hour caption track (short timed segments, a
+sentence end every few segments) and compares chunk_text on the joined
+text with iter_transcript_chunks on the segments: wall time, peak memory,
+chunk count and how many chunks end mid-sentence. Run from backend/:
+
+    python benchmarks/bench_chunker.py --hours 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.embedding_utils import chunk_text, get_encoding, iter_transcript_chunks
+
+VOCABULARY = (
+    "so today we will look at the derivative of a function and how the limit "
+    "definition gives us the slope of the tangent line at any point on the curve"
+).split()
+
+def synthetic_segments(hours: float, seed: int = 0):
+    rng = random.Random(seed)
+    segments, start = [], 0.0
+    while start < hours * 3600:
+        duration = rng.uniform(2.0, 5.0)
+        text = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(5, 12)))
+        if rng.random() < 0.3:
+            text += "."
+        segments.append({"text": text, "start": round(start, 2), "duration": round(duration, 2)})
+        start += duration
+    return segments
+
+def measure(label, make_chunks):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = mid_sentence = 0
+    for chunk in make_chunks():
+        count += 1
+        mid_sentence += not chunk["text"].rstrip().endswith(".")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>24}: {elapsed:7.3f}s  peak {peak / 2**20:7.1f} MiB  "
+          f"{count:5d} chunks  {mid_sentence:5d} end mid-sentence")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.hours)
+    text = " ".join(s["text"] for s in segments)
+    try:
+        get_encoding()
+        tokenizer = "tiktoken"
+    except Exception:
+        tokenizer = "unavailable (word fallback)"
+    print(f"{args.hours}h transcript: {len(segments)} segments, {len(text) / 1e6:.2f}M chars, tokenizer {tokenizer}")
+
+    measure("chunk_text", lambda: chunk_text(text, args.max_tokens, args.overlap))
+    measure("iter_transcript_chunks", lambda: iter_transcript_chunks(segments, args.max_tokens, args.overlap))
+    measure("iter (plain text)", lambda: iter_transcript_chunks(text, args.max_tokens, args.overlap))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark for utils.video_utils.extract_frames sampling modes.
+
+Writes a synthetic lecture-like video (mostly static slides with a moving
+cursor) and times each mode. Run from the backend directory:
+
+    python benchmarks/bench_extract_frames.py --minutes 60 --fps 30
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.video_utils import extract_frames
+
+def write_synthetic_video(path, minutes, fps, width, height):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    total = int(minutes * 60 * fps)
+    slide = np.zeros((height, width, 3), dtype=np.uint8)
+    for i in range(total):
+        if i % int(fps * 90) == 0:
+            # New "slide" every 90 seconds
+            slide[:] = np.random.randint(0, 255, size=3, dtype=np.uint8)
+            cv2.putText(slide, f"Slide {i // int(fps * 90)}", (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        frame = slide.copy()
+        cv2.circle(frame, (i % width, height - 20), 8, (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return total
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--interval", type=float, default=10)
+    parser.add_argument("--modes", default="decode,grab,seek")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_frames_")
+    try:
+        video_path = os.path.join(workdir, "lecture.mp4")
+        started = time.perf_counter()
+        total = write_synthetic_video(video_path, args.minutes, args.fps, args.width, args.height)
+        print(f"Wrote {total} frames ({args.minutes} min @ {args.fps} fps) in {time.perf_counter() - started:.1f}s")
+
+        baseline = None
+        for mode in args.modes.split(","):
+            out = os.path.join(workdir, mode)
+            started = time.perf_counter()
+            frames = extract_frames(video_path, out, interval=args.interval, mode=mode)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"{mode:>7}: {len(frames):4d} frames in {elapsed:7.2f}s ({baseline / elapsed:5.1f}x vs first)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Login-storm benchmark for the bcrypt auth executor.
+
+Fires a burst of password verifications while a probe coroutine measures
+how late the event loop wakes it up (what any other endpoint on the same
+worker would feel). Compares calling bcrypt inline, as the login route
+used to, with auth_utils.verify_password_async. Run from backend/:
+
+    python benchmarks/bench_login_storm.py --logins 40
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auth_utils
+from auth_utils import get_password_hash, verify_password, verify_password_async
+
+PROBE_INTERVAL = 0.01
+
+async def probe(stop: asyncio.Event, delays: list):
+    """Sleeps PROBE_INTERVAL repeatedly and records how late each wake-up is."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+async def inline_login(password, hashed):
+    return verify_password(password, hashed)
+
+async def run(label, login, logins, password, hashed):
+    stop = asyncio.Event()
+    delays = []
+    probe_task = asyncio.create_task(probe(stop, delays))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login(password, hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    assert all(results)
+    delays_ms = sorted(d * 1000 for d in delays) or [0]
+    p99 = delays_ms[min(len(delays_ms) - 1, int(len(delays_ms) * 0.99))]
+    print(
+        f"{label:>9}: {logins / elapsed:6.1f} logins/s | "
+        f"other-request delay median {statistics.median(delays_ms):7.1f} ms, "
+        f"p99 {p99:7.1f} ms, max {delays_ms[-1]:7.1f} ms"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+    print(f"bcrypt rounds={hashed[4:6]}, "
+          f"executor workers={auth_utils.AUTH_HASH_WORKERS}, cpus={os.cpu_count()}")
+
+    await run("inline", inline_login, args.logins, password, hashed)
+    await run("executor", verify_password_async, args.logins, password, hashed)
+    print(auth_utils.get_auth_executor_stats())
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Benchmark for quantized vector storage in the memmap backend
+(VECTOR_PRECISION / VECTOR_RESCORE in vector_store.py).
+
+Indexes one large synthetic video per precision and compares each against
+exact float32 search: recall@k, query latency, the bytes a query scans per
+vector, and the disk used. The "as lists" line is the size of the same
+vectors as Python lists of floats, the form embeddings are passed around in
+before they are stored. Run from backend/:
+
+    python benchmarks/bench_quantization.py --chunks 20000 --dim 384 --top-k 4 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_backends import MemmapBackend
+
+def make_corpus(rng, chunks, dim, clusters=200):
+    # Sentence embeddings are anisotropic and clustered: a shared direction
+    # plus topic centroids plus noise, normalized like MiniLM outputs
+    common = rng.standard_normal(dim)
+    centroids = rng.standard_normal((clusters, dim)) + 2 * common
+    vectors = centroids[rng.integers(0, clusters, chunks)] + 0.8 * rng.standard_normal((chunks, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+def make_queries(rng, vectors, count):
+    picks = vectors[rng.integers(0, len(vectors), count)]
+    queries = picks + 0.5 * rng.standard_normal(picks.shape) / np.sqrt(vectors.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype(np.float32)
+
+def exact_top(vectors, queries, k):
+    distances = (vectors ** 2).sum(1)[None, :] - 2 * queries @ vectors.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+def dir_bytes(path, prefixes):
+    return sum(
+        os.path.getsize(os.path.join(d, f))
+        for d, _, files in os.walk(path) for f in files if f.startswith(prefixes)
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 20])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_corpus(rng, args.chunks, args.dim)
+    queries = make_queries(rng, vectors, args.queries)
+    ids = [f"c{i}" for i in range(args.chunks)]
+    documents = [""] * args.chunks
+    metadatas = [{"video_id": "bench"}] * args.chunks
+    truth = {k: exact_top(vectors, queries, k) for k in args.top_k}
+
+    list_bytes = sys.getsizeof(vectors[0].tolist()) + args.dim * sys.getsizeof(0.5)
+    print(f"{args.chunks} vectors, dim {args.dim}, {args.queries} queries")
+    print(f"as lists              {list_bytes:>6} B/vector  {list_bytes * args.chunks / 2**20:8.1f} MiB")
+
+    configs = [("float32", False), ("float16", False), ("float16", True), ("int8", False), ("int8", True)]
+    for precision, rescore in configs:
+        path = tempfile.mkdtemp(prefix="bench-quant-")
+        try:
+            # HNSW off: measure the quantized scan itself
+            backend = MemmapBackend(path, hnsw_min_vectors=args.chunks + 1, precision=precision, rescore=rescore)
+            backend.upsert("bench", ids, vectors, documents, metadatas)
+            backend.query("bench", queries[0].tolist(), 1)
+
+            scanned = dir_bytes(path, ("vectors-", "scales-"))
+            disk = dir_bytes(path, ("vectors-", "scales-", "full-"))
+            line = f"{precision:<7} rescore={'on ' if rescore else 'off'}  {scanned // args.chunks:>6} B/vector  disk {disk / 2**20:8.1f} MiB"
+            for k in args.top_k:
+                hits, latencies = 0, []
+                for q, query in enumerate(queries):
+                    started = time.perf_counter()
+                    results = backend.query("bench", query, k)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    found = {int(r["id"][1:]) for r in results}
+                    hits += len(found & set(truth[k][q].tolist()))
+                line += f"  recall@{k} {hits / (k * len(queries)):.4f} ({np.mean(latencies):.2f} ms)"
+            print(line)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
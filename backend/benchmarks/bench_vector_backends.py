@@ -0,0 +1,155 @@
+"""
+Benchmark for the vector_store backends (vector_backends.py).
+
+For each backend and corpus size, one process inserts random chunk
+embeddings for N videos, then a fresh process (like a newly started
+worker) runs queries against random videos. Reports insert and query
+latency, the RSS of each process, the disk used and, for memmap, graph_mib:
+the size of the HNSW graphs, which every worker loads into private memory
+for each open video (the other files are shared memory-mapped pages).
+--batch writes each video in several upserts, like store_video_chunks_async
+with STORE_BATCH_CHUNKS. Run from backend/:
+
+    python benchmarks/bench_vector_backends.py --videos 1000 10000 100000 --backends memmap chroma
+
+Measured on one CPU (chromadb 1.5.9, hnswlib 0.8), dim 384, top_k 20,
+300 queries, whole videos per upsert unless noted:
+
+    videos  chunks  backend  insert/video  query avg  p95      query RSS  disk
+      1000      20  memmap        3.4 ms    0.64 ms   0.86 ms    50 MiB     32 MiB
+      1000      20  chroma         37 ms    16.7 ms   20.6 ms   153 MiB     45 MiB
+     10000      20  memmap        2.5 ms    0.57 ms   0.67 ms    50 MiB    320 MiB
+     10000      20  chroma         61 ms     267 ms    290 ms   515 MiB    434 MiB
+    100000      20  memmap        2.9 ms    0.91 ms   1.22 ms    50 MiB   3204 MiB
+    100000       2  memmap        0.9 ms    0.39 ms   0.55 ms    43 MiB    364 MiB
+    100000       2  chroma         18 ms     249 ms    284 ms   518 MiB    435 MiB
+         2   20000  memmap, HNSW (--batch 64)
+                                   56 s     0.95 ms   0.87 ms   118 MiB    127 MiB (graph_mib 64)
+         2   20000  memmap, exact (--batch 64, HNSW_MIN_VECTORS above 20000)
+                                   48 s     2.20 ms   3.23 ms   105 MiB     63 MiB
+
+Chroma filters one shared collection by video_id, so its query time grows
+with the whole corpus; memmap opens only the queried video. With --batch
+most of the memmap insert time is rewriting the video's vectors file on
+every batch; the single graph build adds about 8 s per video. A few slow
+first queries put the HNSW average above its p95. Not measured: Chroma
+with 100000 videos of 20 chunks (2 chunks per video already took 30
+minutes of inserts; 20 would take hours here) and Chroma on the
+20000-chunk videos.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def make_chunks(rng, video_id, chunks, dim):
+    vectors = rng.standard_normal((chunks, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"{video_id}_{i}" for i in range(chunks)]
+    documents = [f"chunk {i} of {video_id}" for i in range(chunks)]
+    metadatas = [{"video_id": video_id, "chunk_id": i} for i in range(chunks)]
+    return ids, vectors, documents, metadatas
+
+def run_insert(backend, videos, chunks, dim, batch):
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    for v in range(videos):
+        video_id = f"video{v}"
+        ids, vectors, documents, metadatas = make_chunks(rng, video_id, chunks, dim)
+        for start in range(0, chunks, batch or chunks):
+            rows = slice(start, start + (batch or chunks))
+            backend.upsert(video_id, ids[rows], vectors[rows].tolist(), documents[rows], metadatas[rows])
+        backend.finalize(video_id)
+    elapsed = time.perf_counter() - started
+    return {"insert_s": round(elapsed, 2), "insert_ms_per_video": round(elapsed / videos * 1000, 3), "insert_rss_mib": round(rss_mib(), 1)}
+
+def run_query(backend, videos, queries, dim, top_k):
+    rng = np.random.default_rng(1)
+    picks = random.Random(1)
+    latencies = []
+    for _ in range(queries):
+        query = rng.standard_normal(dim).astype(np.float32)
+        video_id = f"video{picks.randrange(videos)}"
+        started = time.perf_counter()
+        backend.query(video_id, query.tolist(), top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        "query_ms_avg": round(sum(latencies) / len(latencies), 3),
+        "query_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "query_rss_mib": round(rss_mib(), 1),
+    }
+
+def worker(args):
+    from vector_backends import create_backend
+    backend = create_backend(args.backend, args.path)
+    if args.phase == "insert":
+        result = run_insert(backend, args.worker_videos, args.chunks, args.dim, args.batch)
+    else:
+        result = run_query(backend, args.worker_videos, args.queries, args.dim, args.top_k)
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["memmap", "chroma"])
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per video")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=0, help="chunks per upsert (default: whole video)")
+    # Internal: run one phase in a subprocess
+    parser.add_argument("--phase", choices=["insert", "query"])
+    parser.add_argument("--backend")
+    parser.add_argument("--path")
+    parser.add_argument("--worker-videos", type=int)
+    args = parser.parse_args()
+
+    if args.phase:
+        worker(args)
+        return
+
+    print(f"{args.chunks} chunks/video, dim {args.dim}, top_k {args.top_k}, {args.queries} queries, batch {args.batch or args.chunks}")
+    for videos in args.videos:
+        for name in args.backends:
+            path = tempfile.mkdtemp(prefix=f"bench-{name}-")
+            result = {}
+            try:
+                for phase in ("insert", "query"):
+                    out = subprocess.run(
+                        [sys.executable, __file__, "--phase", phase, "--backend", name, "--path", path,
+                         "--worker-videos", str(videos), "--chunks", str(args.chunks), "--dim", str(args.dim),
+                         "--queries", str(args.queries), "--top-k", str(args.top_k), "--batch", str(args.batch)],
+                        capture_output=True, text=True
+                    )
+                    if out.returncode != 0:
+                        result = {"error": out.stderr.strip().splitlines()[-1]}
+                        break
+                    result.update(json.loads(out.stdout.strip().splitlines()[-1]))
+                sizes = {os.path.join(d, f): os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files}
+                result["disk_mib"] = round(sum(sizes.values()) / 2**20, 1)
+                if name == "memmap":
+                    graphs = sum(size for file, size in sizes.items() if os.path.basename(file).startswith("hnsw-"))
+                    result["graph_mib"] = round(graphs / 2**20, 1)
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+            print(f"{videos:>7} videos  {name:<7} {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo.errors import DuplicateKeyError
+from ai_client import async_client
+from utils.embedding_utils import count_tokens
+
+# Token budget for verbatim recent turns in each prompt. Once the unsummarized
+# history exceeds it, the oldest turns are folded into the rolling summary
+# until only CHAT_KEEP_RATIO of the budget remains verbatim.
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 3000))
+CHAT_KEEP_RATIO = float(os.getenv("CHAT_KEEP_RATIO", 0.5))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 400))
+# Upper bound on unsummarized messages read per request, and per page
+# when compaction folds older turns into the summary
+CHAT_MEMORY_SCAN = int(os.getenv("CHAT_MEMORY_SCAN", 50))
+MEMORY_MODEL = "deepseek/deepseek-chat"
+
+SUMMARY_PROMPT = (
+    "You maintain the running memory of a tutoring conversation. Merge the "
+    "existing summary with the new messages into one concise summary. Keep the "
+    "student's goals, level, topics covered, open questions and any facts the "
+    "tutor will need later. Write plain prose, no preamble."
+)
+
+_stats = {"compactions": 0, "folded_messages": 0, "failures": 0}
+
+def message_tokens(doc: Dict) -> int:
+    """Token count of a stored chat message; older documents predate the cached count."""
+    tokens = doc.get("tokens")
+    if tokens is None:
+        tokens = count_tokens(doc.get("content") or "")
+    return tokens
+
+def _after(memory: Optional[Dict]) -> Dict:
+    """Query fragment selecting messages newer than the summarized prefix."""
+    if not memory or not memory.get("until_ts"):
+        return {}
+    ts, doc_id = memory["until_ts"], memory["until_id"]
+    return {"$or": [{"timestamp": {"$gt": ts}}, {"timestamp": ts, "_id": {"$gt": doc_id}}]}
+
+def _before(doc: Dict) -> Dict:
+    """Query fragment selecting messages older than doc."""
+    ts, doc_id = doc["timestamp"], doc["_id"]
+    return {"$or": [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": doc_id}}]}
+
+async def _unsummarized(db, user_id: str, memory: Optional[Dict]) -> List[Dict]:
+    """Newest-first messages that are not covered by the summary yet (at most CHAT_MEMORY_SCAN)."""
+    query = {"user_id": user_id, **_after(memory)}
+    return await db.chat_history.find(
+        query, {"role": 1, "content": 1, "tokens": 1, "timestamp": 1}
+    ).sort([("timestamp", -1), ("_id", -1)]).limit(CHAT_MEMORY_SCAN).to_list(CHAT_MEMORY_SCAN)
+
+async def _oldest_unsummarized(db, user_id: str, memory: Optional[Dict], keep_from: Optional[Dict]) -> List[Dict]:
+    """Oldest-first page of unsummarized messages older than keep_from (all of them if None)."""
+    bounds = [fragment for fragment in (_after(memory), _before(keep_from) if keep_from else {}) if fragment]
+    query = {"user_id": user_id, **({"$and": bounds} if bounds else {})}
+    return await db.chat_history.find(
+        query, {"role": 1, "content": 1, "tokens": 1, "timestamp": 1}
+    ).sort([("timestamp", 1), ("_id", 1)]).limit(CHAT_MEMORY_SCAN).to_list(CHAT_MEMORY_SCAN)
+
+def _split_recent(history: List[Dict], budget: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Splits newest-first history into (recent, older): the longest run of
+    newest messages fitting in budget, and everything before it.
+    """
+    used = 0
+    for i, doc in enumerate(history):
+        used += message_tokens(doc)
+        if used > budget:
+            return history[:i], history[i:]
+    return history, []
+
+async def build_context(db, user_id: str, system_prompt: str, message: str) -> List[Dict]:
+    """
+    Prompt messages for a chat turn: system prompt, rolling summary of older
+    turns, then as many recent turns as fit in CHAT_HISTORY_TOKENS.
+    """
+    memory = await db.chat_memory.find_one({"_id": user_id})
+    history = await _unsummarized(db, user_id, memory)
+    recent, _ = _split_recent(history, CHAT_HISTORY_TOKENS)
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if memory and memory.get("summary"):
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{memory['summary']}"
+        })
+    for h in reversed(recent):
+        messages.append({"role": h["role"], "content": h["content"]})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+async def _fold(db, user_id: str, memory: Optional[Dict], page: List[Dict]) -> Optional[Dict]:
+    """
+    Merges an oldest-first page of messages into the summary. Returns the
+    new memory, or None if summarizing failed or another worker advanced
+    the summary first.
+    """
+    transcript = "\n".join(f"{h['role']}: {h['content']}" for h in page)
+    previous = (memory or {}).get("summary") or "(none)"
+
+    try:
+        response = await async_client.chat.completions.create(
+            model=MEMORY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Existing summary:\n{previous}\n\nNew messages:\n{transcript}"}
+            ],
+            max_tokens=CHAT_SUMMARY_TOKENS
+        )
+        summary = response.choices[0].message.content.strip()
+    except Exception as e:
+        _stats["failures"] += 1
+        print(f"Chat Memory Error: {e}")
+        return None
+
+    last = page[-1]
+    update = {
+        "summary": summary,
+        "summary_tokens": count_tokens(summary),
+        "until_ts": last["timestamp"],
+        "until_id": last["_id"],
+        "updated_at": datetime.utcnow(),
+    }
+    # Only advance from the prefix we read, so concurrent compactions cannot
+    # fold the same turns twice
+    try:
+        result = await db.chat_memory.update_one(
+            {"_id": user_id, "until_id": (memory or {}).get("until_id")},
+            {"$set": update},
+            upsert=memory is None
+        )
+    except DuplicateKeyError:
+        # Another worker created the memory first
+        return None
+    if not (result.modified_count or result.upserted_id):
+        return None
+    return {"_id": user_id, **update}
+
+async def compact_memory(db, user_id: str) -> int:
+    """
+    Folds unsummarized turns into the user's summary, oldest first, once
+    they no longer fit the history budget or the CHAT_MEMORY_SCAN window
+    build_context reads. Everything older than the newest turns fitting
+    CHAT_KEEP_RATIO of the budget is folded, a page at a time, so long
+    backlogs (e.g. history from before summaries existed) are summarized
+    too. Returns the number of messages folded.
+    """
+    if not async_client:
+        return 0
+
+    memory = await db.chat_memory.find_one({"_id": user_id})
+    newest = await _unsummarized(db, user_id, memory)
+    if len(newest) < CHAT_MEMORY_SCAN and sum(message_tokens(h) for h in newest) <= CHAT_HISTORY_TOKENS:
+        return 0
+
+    recent, _ = _split_recent(newest, int(CHAT_HISTORY_TOKENS * CHAT_KEEP_RATIO))
+    keep_from = recent[-1] if recent else None
+
+    folded = 0
+    while True:
+        page = await _oldest_unsummarized(db, user_id, memory, keep_from)
+        if not page:
+            break
+        # Keep each summarization call within the history budget
+        used, size = 0, 0
+        for doc in page:
+            used += message_tokens(doc)
+            if size and used > CHAT_HISTORY_TOKENS:
+                break
+            size += 1
+        page = page[:size]
+
+        memory = await _fold(db, user_id, memory, page)
+        if memory is None:
+            break
+        folded += len(page)
+        _stats["compactions"] += 1
+        _stats["folded_messages"] += len(page)
+    return folded
+
+async def clear_memory(db, user_id: str):
+    await db.chat_memory.delete_one({"_id": user_id})
+
+def get_chat_memory_stats() -> Dict:
+    return {
+        **_stats,
+        "history_tokens": CHAT_HISTORY_TOKENS,
+        "summary_tokens": CHAT_SUMMARY_TOKENS,
+    }
@@ -1,4 +1,5 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
 import os
 from dotenv import load_dotenv
 
@@ -21,6 +22,67 @@ except Exception as e:
     client = None
     db = None
 
+# Indexes backing every hot query in the routers. Keep in sync with
+# db_diagnostics.QUERIES, which checks that each query actually uses one.
+# History indexes end in _id because utils.pagination sorts on (field, _id).
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "videos": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+    ],
+    "chat_history": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timestamp_id"),
+    ],
+    "ocr": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+    ],
+    "math_solutions": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+    ],
+    "quizzes": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created_id"),
+    ],
+    "transcripts": [
+        IndexModel([("video_id", ASCENDING), ("language", ASCENDING), ("source", ASCENDING)], unique=True, name="video_language_source"),
+    ],
+    "summary_cache": [
+        IndexModel([("video_id", ASCENDING)], name="video"),
+        # Mongo deletes entries once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    ],
+    "chunk_summaries": [
+        IndexModel([("video_id", ASCENDING)], name="video"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    ],
+    "answer_cache": [
+        IndexModel([("video_id", ASCENDING), ("content_hash", ASCENDING), ("created_at", DESCENDING)], name="video_hash_created"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    ],
+    "jobs": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel([("status", ASCENDING), ("heartbeat", ASCENDING)], name="status_heartbeat"),
+        IndexModel([("status", ASCENDING), ("updated_at", ASCENDING)], name="status_updated"),
+    ],
+}
+
+async def ensure_indexes():
+    """
+    Idempotently creates INDEXES. Safe to run on every startup: existing
+    indexes with the same definition are left alone. A failure on one
+    collection (e.g. duplicate emails blocking the unique index) is logged
+    and does not stop the others.
+    """
+    if db is None:
+        return
+    for collection, indexes in INDEXES.items():
+        try:
+            names = await db[collection].create_indexes(indexes)
+            print(f"DEBUG: Indexes ready on {collection}: {', '.join(names)}")
+        except Exception as e:
+            print(f"Index creation failed on {collection}: {e}")
+
 async def get_database():
     return db
 
@@ -0,0 +1,88 @@
+"""
+Query-plan diagnostics.
+
+Runs explain() on the queries the routers issue and flags any whose
+winning plan contains a collection scan or an in-memory sort. Run from
+the backend directory:
+
+    python db_diagnostics.py            # report
+    python db_diagnostics.py --create   # create indexes first, then report
+"""
+import asyncio
+import sys
+from datetime import datetime
+from database import get_database, ensure_indexes
+
+SAMPLE_ID = "diagnostics"
+
+# (label, collection, filter, sort, limit) mirroring the router queries
+QUERIES = [
+    ("auth.get_current_user / login", "users", {"email": "diagnostics@example.com"}, None, 1),
+    ("videos.get_user_videos", "videos", {"user_id": SAMPLE_ID}, [("created_at", -1), ("_id", -1)], 100),
+    ("videos.find_user_video", "videos", {"user_id": SAMPLE_ID, "_id": SAMPLE_ID}, None, 1),
+    ("chat.build_chat_messages", "chat_history", {"user_id": SAMPLE_ID}, [("timestamp", -1), ("_id", -1)], 10),
+    ("chat.get_chat_history", "chat_history", {"user_id": SAMPLE_ID}, [("timestamp", 1), ("_id", 1)], 100),
+    ("ocr.get_ocr_history", "ocr", {"user_id": SAMPLE_ID}, [("created_at", -1), ("_id", -1)], 100),
+    ("math.get_math_history", "math_solutions", {"user_id": SAMPLE_ID}, [("created_at", -1), ("_id", -1)], 100),
+    ("quizzes.get_user_quizzes", "quizzes", {"user_id": SAMPLE_ID}, [("created_at", -1), ("_id", -1)], 100),
+    ("transcript_store.get_cached_transcript", "transcripts", {"video_id": SAMPLE_ID}, None, 20),
+    ("summary_cache.get_cached_summary", "summary_cache", {"_id": SAMPLE_ID, "expires_at": {"$gt": datetime.utcnow()}}, None, 1),
+    ("jobs.get_user_jobs", "jobs", {"user_id": SAMPLE_ID}, [("created_at", -1)], 20),
+    ("job_runner.recover_jobs (stale)", "jobs", {"status": "running", "heartbeat": {"$lt": datetime.utcnow()}}, None, 0),
+    ("job_runner.recover_jobs (orphaned)", "jobs", {"status": "queued", "updated_at": {"$lt": datetime.utcnow()}}, None, 0),
+]
+
+def _plan_stages(plan):
+    """Yields every stage name in a (possibly nested) query plan."""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def explain_queries():
+    """Returns one result dict per entry in QUERIES."""
+    db = await get_database()
+    results = []
+    for label, collection, query, sort, limit in QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        explain = await cursor.explain()
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(winning))
+        results.append({
+            "label": label,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return results
+
+async def main():
+    if "--create" in sys.argv:
+        await ensure_indexes()
+
+    problems = 0
+    for result in await explain_queries():
+        flags = []
+        if result["collscan"]:
+            flags.append("COLLECTION SCAN")
+        if result["in_memory_sort"]:
+            flags.append("IN-MEMORY SORT")
+        problems += bool(flags)
+        status = ", ".join(flags) if flags else "ok"
+        print(f"[{status:^16}] {result['label']:<42} {result['collection']:<15} {' <- '.join(result['stages'])}")
+
+    print(f"\n{problems} of {len(QUERIES)} queries need attention")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from database import get_database
+
+# Configuration
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 4))
+JOB_CPU_WORKERS = int(os.getenv("JOB_CPU_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", 15))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+# Identifies the process that owns a running job, so a dead worker's jobs
+# can be recognised by their stale heartbeat and re-queued.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_handlers: Dict[str, Callable[..., Awaitable]] = {}
+_semaphore: Optional[asyncio.Semaphore] = None
+# job id -> task scheduled on this worker (waiting for a slot or running)
+_tasks: Dict[str, asyncio.Task] = {}
+_sweeper: Optional[asyncio.Task] = None
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+
+def register_job_handler(kind: str):
+    """
+    Registers an async handler for a job kind. Handlers are called as
+    handler(job, **params) where job is a JobContext, and return a
+    BSON-serializable result.
+    """
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound stages (decoding, frame extraction, OCR)."""
+    global _cpu_executor
+    if _cpu_executor is None:
+        # spawn, not fork: the parent holds an event loop, DB and HTTP pools
+        _cpu_executor = ProcessPoolExecutor(
+            max_workers=JOB_CPU_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _cpu_executor
+
+async def run_cpu(fn, *args):
+    """Runs a picklable top-level function in the CPU process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), fn, *args)
+
+async def noop_progress(stage: str, progress: Optional[float] = None):
+    """Default progress callback for pipelines run inline in a request."""
+    return None
+
+class JobContext:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    async def progress(self, stage: str, progress: Optional[float] = None):
+        db = await get_database()
+        now = datetime.utcnow()
+        update = {"stage": stage, "heartbeat": now, "updated_at": now}
+        if progress is not None:
+            update["progress"] = round(progress, 3)
+        await db.jobs.update_one({"_id": self.job_id, "owner": WORKER_ID}, {"$set": update})
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(JOB_CONCURRENCY)
+    return _semaphore
+
+def _schedule(job_id: str) -> bool:
+    """Schedules a job on this worker unless it already has a task for it."""
+    if job_id in _tasks:
+        return False
+    task = asyncio.create_task(_run_job(job_id))
+    _tasks[job_id] = task
+    task.add_done_callback(lambda _: _tasks.pop(job_id, None))
+    return True
+
+async def submit_job(user_id: str, kind: str, params: Dict) -> str:
+    """Records a job in Mongo and schedules it on this worker. Returns the job id."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    db = await get_database()
+    now = datetime.utcnow()
+    job_id = str(uuid.uuid4())
+    await db.jobs.insert_one({
+        "_id": job_id,
+        "user_id": user_id,
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0.0,
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "owner": None,
+        "heartbeat": None,
+        "created_at": now,
+        "updated_at": now
+    })
+    _schedule(job_id)
+    return job_id
+
+async def _heartbeat(job_id: str):
+    db = await get_database()
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        await db.jobs.update_one(
+            {"_id": job_id, "owner": WORKER_ID},
+            {"$set": {"heartbeat": datetime.utcnow()}}
+        )
+
+async def _finish(job_id: str, update: Dict):
+    db = await get_database()
+    now = datetime.utcnow()
+    update.update({"finished_at": now, "updated_at": now})
+    await db.jobs.update_one({"_id": job_id, "owner": WORKER_ID}, {"$set": update})
+
+async def _run_job(job_id: str):
+    async with _get_semaphore():
+        db = await get_database()
+        now = datetime.utcnow()
+        # Atomic claim, so a job re-queued by several workers only runs once
+        job = await db.jobs.find_one_and_update(
+            {"_id": job_id, "status": "queued"},
+            {
+                "$set": {"status": "running", "owner": WORKER_ID, "heartbeat": now, "started_at": now, "updated_at": now},
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+
+        handler = _handlers.get(job["kind"])
+        if handler is None:
+            await _finish(job_id, {"status": "failed", "error": f"No handler for job kind {job['kind']}"})
+            return
+
+        heartbeat = asyncio.create_task(_heartbeat(job_id))
+        try:
+            result = await handler(JobContext(job_id), **job["params"])
+            await _finish(job_id, {"status": "succeeded", "stage": "done", "progress": 1.0, "result": result})
+        except HTTPException as e:
+            await _finish(job_id, {"status": "failed", "error": e.detail})
+        except Exception as e:
+            print(f"Job {job_id} ({job['kind']}) failed: {e}")
+            await _finish(job_id, {"status": "failed", "error": str(e)})
+        finally:
+            heartbeat.cancel()
+
+async def recover_jobs() -> int:
+    """
+    Re-queues jobs whose owning worker stopped heartbeating (crash, deploy,
+    OOM kill) and schedules queued jobs nobody picked up. Jobs that already
+    used JOB_MAX_ATTEMPTS are marked failed instead. Returns the number of
+    jobs scheduled on this worker.
+    """
+    db = await get_database()
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_STALE_SECONDS)
+
+    await db.jobs.update_many(
+        {"status": "running", "heartbeat": {"$lt": stale}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "Worker stopped responding", "finished_at": now, "updated_at": now}}
+    )
+    await db.jobs.update_many(
+        {"status": "running", "heartbeat": {"$lt": stale}},
+        {"$set": {"status": "queued", "stage": "requeued", "owner": None, "updated_at": now}}
+    )
+
+    orphaned = await db.jobs.find(
+        {"status": "queued", "updated_at": {"$lt": stale}},
+        {"_id": 1}
+    ).to_list(None)
+    scheduled = 0
+    for job in orphaned:
+        # Jobs already waiting for a slot here are not orphaned
+        if job["_id"] in _tasks:
+            continue
+        # Bumping updated_at claims the job for this sweep, so other workers'
+        # sweeps skip it until it goes stale again
+        claimed = await db.jobs.update_one(
+            {"_id": job["_id"], "status": "queued", "updated_at": {"$lt": stale}},
+            {"$set": {"updated_at": now}}
+        )
+        if claimed.modified_count and _schedule(job["_id"]):
+            scheduled += 1
+    if scheduled:
+        print(f"DEBUG: Recovered {scheduled} background jobs")
+    return scheduled
+
+async def _sweep():
+    while True:
+        try:
+            await recover_jobs()
+        except Exception as e:
+            print(f"Job recovery error: {e}")
+        await asyncio.sleep(JOB_STALE_SECONDS)
+
+def start_job_runner():
+    """Starts the periodic recovery sweep; call once per worker on startup."""
+    global _sweeper
+    if _sweeper is None or _sweeper.done():
+        _sweeper = asyncio.create_task(_sweep())
+
+async def stop_job_runner():
+    if _sweeper:
+        _sweeper.cancel()
+    if _cpu_executor:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+async def get_job(job_id: str, user_id: str) -> Optional[Dict]:
+    db = await get_database()
+    return await db.jobs.find_one({"_id": job_id, "user_id": user_id}, {"params": 0, "owner": 0})
+
+def get_job_stats() -> Dict:
+    return {
+        "worker_id": WORKER_ID,
+        "concurrency": JOB_CONCURRENCY,
+        "cpu_workers": JOB_CPU_WORKERS,
+        "active_tasks": len(_tasks),
+    }
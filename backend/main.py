@@ -1,5 +1,7 @@
 import uvicorn
 import os
+import sys
+import asyncio
 from dotenv import load_dotenv
 # Load env before ANY other imports
 load_dotenv()
@@ -12,8 +14,20 @@ from dotenv import load_dotenv
 # Load environment variables first
 load_dotenv()
 
-from routers import auth, videos, quizzes, ocr, math, chat, vdo_ocr
-from database import close_db
+from routers import auth, videos, quizzes, ocr, math, chat, vdo_ocr, jobs
+from database import close_db, ensure_indexes
+from ai_client import close_ai_clients
+from utils.embedding_service import warm_up as warm_up_embeddings
+from utils.embedding_batcher import get_batcher_stats
+from utils.embedding_cache import get_embedding_cache_stats
+from summary_cache import get_summary_cache_stats
+from chat_memory import get_chat_memory_stats
+from summarizer import get_summarizer_stats
+from answer_cache import get_answer_cache_stats
+from job_runner import start_job_runner, stop_job_runner, get_job_stats
+from ocr_utils import shutdown_ocr_executor
+from auth_utils import get_auth_executor_stats
+from routers.auth import user_cache
 
 # Load environment variables
 load_dotenv()
@@ -38,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.middleware("http")
@@ -56,6 +71,7 @@ app.include_router(ocr.router)
 app.include_router(math.router)
 app.include_router(chat.router)
 app.include_router(vdo_ocr.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 async def root():
@@ -65,9 +81,42 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+def _retrieval_stats():
+    # vector_store is imported lazily by the routers; don't open ChromaDB just for stats
+    vector_store = sys.modules.get("vector_store")
+    return vector_store.get_retrieval_stats() if vector_store else {}
+
+@app.get("/api/stats")
+async def runtime_stats():
+    """In-process performance counters for this worker."""
+    return {
+        "embedding_batches": get_batcher_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "summary_cache": get_summary_cache_stats(),
+        "summarizer": get_summarizer_stats(),
+        "answer_cache": get_answer_cache_stats(),
+        "retrieval": _retrieval_stats(),
+        "jobs": get_job_stats(),
+        "auth_hashing": get_auth_executor_stats(),
+        "user_cache": user_cache.stats(),
+        "chat_memory": get_chat_memory_stats(),
+    }
+
+@app.on_event("startup")
+async def startup_event():
+    await ensure_indexes()
+    # Load the embedding model once per worker before serving traffic
+    if os.getenv("EMBEDDING_WARMUP", "true").lower() == "true":
+        await asyncio.to_thread(warm_up_embeddings)
+    # Resume background jobs left behind by crashed workers
+    start_job_runner()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     await close_db()
+    await close_ai_clients()
+    await stop_job_runner()
+    shutdown_ocr_executor()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
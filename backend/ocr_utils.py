@@ -1,8 +1,19 @@
 import easyocr
 import threading
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+# Parallel OCR settings. Each worker process keeps its own warm Reader, so
+# memory grows by roughly one model per worker.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+OCR_THREADS_PER_WORKER = int(os.getenv("OCR_THREADS_PER_WORKER", max(1, (os.cpu_count() or 1) // OCR_WORKERS)))
 
 _reader = None
 _lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
 
 def get_reader(langs=['en', 'hi']):
     global _reader
@@ -13,3 +24,55 @@ def get_reader(langs=['en', 'hi']):
                 # Note: We use CPU specifically to avoid issues if GPU is busy/not found
                 _reader = easyocr.Reader(langs, gpu=False)
     return _reader
+
+def _init_ocr_worker(threads: int):
+    """Runs once in each OCR process: cap torch threads and load the model."""
+    import torch
+    # Without this every process would try to use all cores
+    torch.set_num_threads(threads)
+    get_reader()
+
+def ocr_image_text(image_path: str) -> str:
+    """OCR one image and join the detected text. Blocking."""
+    results = get_reader().readtext(image_path)
+    return " ".join([res[1] for res in results])
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_ocr_worker,
+            initargs=(OCR_THREADS_PER_WORKER,)
+        )
+    return _executor
+
+async def ocr_images(
+    image_paths: List[str],
+    on_progress: Optional[Callable[[int, int], Awaitable]] = None
+) -> List[str]:
+    """
+    OCR many images across the worker pool. Results come back in the same
+    order as image_paths; on_progress(done, total) is awaited as each
+    image finishes.
+    """
+    if not image_paths:
+        return []
+
+    loop = asyncio.get_running_loop()
+    executor = get_ocr_executor()
+    futures = [loop.run_in_executor(executor, ocr_image_text, path) for path in image_paths]
+
+    if on_progress:
+        done = 0
+        for finished in asyncio.as_completed(futures):
+            await finished
+            done += 1
+            await on_progress(done, len(futures))
+
+    return list(await asyncio.gather(*futures))
+
+def shutdown_ocr_executor():
+    if _executor:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -4,12 +4,13 @@ from fastapi.responses import RedirectResponse
 from fastapi_sso.sso.google import GoogleSSO
 from fastapi_sso.sso.github import GithubSSO
 from models import UserCreate, UserInDB, UserResponse, LoginRequest, Token, PasswordResetRequest, PasswordResetConfirm
-from auth_utils import get_password_hash, verify_password, create_access_token, decode_token, create_password_reset_token, verify_password_reset_token
+from auth_utils import get_password_hash_async, verify_password_async, AuthBusyError, create_access_token, decode_token, create_password_reset_token, verify_password_reset_token
 
 from email_utils import email_utils
 import os
 from database import get_database
 from datetime import datetime
+from utils.ttl_cache import TTLCache
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 # Use CLIENT_URL (consistent with main.py CORS) or fallback to localhost
@@ -17,6 +18,23 @@ frontend_url = os.getenv("CLIENT_URL") or os.getenv("FRONTEND_URL") or "http://l
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Resolved principals keyed by token subject (email). Per worker, so changes
+# made on another worker become visible after at most USER_CACHE_TTL_SECONDS.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(email: str):
+    """Call after any change to a user's profile, password or account."""
+    user_cache.invalidate(email)
+
+def auth_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     print(f"DEBUG: Decoding token: {token[:10]}...")
     payload = decode_token(token)
@@ -34,19 +52,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+
+    cached = user_cache.get(email)
+    if cached is not None:
+        return cached
     
     db = await get_database()
-    user = await db.users.find_one({"email": email})
+    user = await db.users.find_one(
+        {"email": email},
+        {"username": 1, "email": 1, "profile_picture": 1, "created_at": 1}
+    )
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserResponse(
+    current_user = UserResponse(
         id=str(user["_id"]),
         username=user["username"],
         email=user["email"],
         profile_picture=user.get("profile_picture"),
         created_at=user["created_at"]
     )
+    user_cache.set(email, current_user)
+    return current_user
 
 @router.post("/signup", response_model=UserResponse)
 async def signup(user_data: UserCreate):
@@ -57,11 +84,16 @@ async def signup(user_data: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    try:
+        password_hash = await get_password_hash_async(user_data.password)
+    except AuthBusyError:
+        raise auth_busy_exception()
+
     # Create new user
     new_user = {
         "username": user_data.username,
         "email": user_data.email,
-        "password_hash": get_password_hash(user_data.password),
+        "password_hash": password_hash,
         "profile_picture": user_data.profile_picture,
         "created_at": datetime.utcnow()
     }
@@ -85,7 +117,11 @@ async def login(login_data: LoginRequest):
     db = await get_database()
     
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password_hash"]):
+    try:
+        valid = bool(user) and await verify_password_async(login_data.password, user["password_hash"])
+    except AuthBusyError:
+        raise auth_busy_exception()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -125,11 +161,15 @@ async def reset_password(request: PasswordResetConfirm):
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
     db = await get_database()
-    new_hash = get_password_hash(request.new_password)
+    try:
+        new_hash = await get_password_hash_async(request.new_password)
+    except AuthBusyError:
+        raise auth_busy_exception()
     await db.users.update_one(
         {"email": email},
         {"$set": {"password_hash": new_hash}}
     )
+    invalidate_cached_user(email)
     
     return {"message": "Password reset successful"}
 
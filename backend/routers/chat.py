@@ -1,73 +1,139 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response, BackgroundTasks
+from typing import Optional
 from database import get_database
 from routers.auth import get_current_user
 from models import UserResponse
 from datetime import datetime
 import os
-from ai_client import client
+from ai_client import async_client
+from chat_memory import build_context, compact_memory, clear_memory
+from utils.embedding_utils import count_tokens
+from utils.pagination import paginate, preview, as_doc_id, NEXT_CURSOR_HEADER
+from utils.streaming import sse_event, sse_response, stream_completion
 
 router = APIRouter(prefix="/api/chat", tags=["Chatbot"])
 
+SYSTEM_PROMPT = "You are a helpful and knowledgeable virtual tutor. Help the user understand complex concepts, solve problems, and provide educational guidance. Keep responses encouraging and professional."
+
+async def build_chat_messages(db, user_id: str, message: str) -> list:
+    # Rolling summary plus the recent turns that fit the token budget
+    return await build_context(db, user_id, SYSTEM_PROMPT, message)
+
+async def save_chat_turn(db, user_id: str, message: str, reply: str):
+    # Save user message
+    await db.chat_history.insert_one({
+        "user_id": user_id,
+        "role": "user",
+        "content": message,
+        "tokens": count_tokens(message),
+        "timestamp": datetime.utcnow()
+    })
+    
+    # Save assistant reply
+    await db.chat_history.insert_one({
+        "user_id": user_id,
+        "role": "assistant",
+        "content": reply,
+        "tokens": count_tokens(reply),
+        "timestamp": datetime.utcnow()
+    })
+
 @router.post("/message")
 async def send_message(
+    background_tasks: BackgroundTasks,
     message: str = Body(..., embed=True),
     current_user: UserResponse = Depends(get_current_user)
 ):
     db = await get_database()
-    
-    # Get recent conversation history
-    history = await db.chat_history.find({"user_id": current_user.id}).sort("timestamp", -1).limit(10).to_list(10)
-    history.reverse()
-    
-    messages = [
-        {"role": "system", "content": "You are a helpful and knowledgeable virtual tutor. Help the user understand complex concepts, solve problems, and provide educational guidance. Keep responses encouraging and professional."}
-    ]
-    
-    for h in history:
-        messages.append({"role": h["role"], "content": h["content"]})
-    
-    messages.append({"role": "user", "content": message})
+    messages = await build_chat_messages(db, current_user.id, message)
 
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
             messages=messages,
-            max_tokens=client.default_max_tokens
+            max_tokens=async_client.default_max_tokens
         )
         
         reply = response.choices[0].message.content
-        
-        # Save user message
-        await db.chat_history.insert_one({
-            "user_id": current_user.id,
-            "role": "user",
-            "content": message,
-            "timestamp": datetime.utcnow()
-        })
-        
-        # Save assistant reply
-        await db.chat_history.insert_one({
-            "user_id": current_user.id,
-            "role": "assistant",
-            "content": reply,
-            "timestamp": datetime.utcnow()
-        })
+        await save_chat_turn(db, current_user.id, message, reply)
+        background_tasks.add_task(compact_memory, db, current_user.id)
         
         return {"reply": reply}
     except Exception as e:
         print(f"Chat Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get tutor response")
 
+@router.post("/message/stream")
+async def send_message_stream(
+    background_tasks: BackgroundTasks,
+    message: str = Body(..., embed=True),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of /message. Emits Server-Sent Events:
+    'token' ({"content"}) for each delta, then 'done' ({"reply"}) once the
+    turn has been saved, or 'error' ({"detail"}).
+    """
+    if not async_client:
+        raise HTTPException(status_code=500, detail="AI service unavailable")
+
+    db = await get_database()
+    messages = await build_chat_messages(db, current_user.id, message)
+
+    async def events():
+        parts = []
+        try:
+            async for delta in stream_completion(messages):
+                parts.append(delta)
+                yield sse_event("token", {"content": delta})
+        except Exception as e:
+            print(f"Chat Stream Error: {e}")
+            yield sse_event("error", {"detail": "Failed to get tutor response"})
+            return
+
+        reply = "".join(parts)
+        await save_chat_turn(db, current_user.id, message, reply)
+        background_tasks.add_task(compact_memory, db, current_user.id)
+        yield sse_event("done", {"reply": reply})
+
+    return sse_response(events())
+
+CHAT_LIST_PROJECTION = {"role": 1, "timestamp": 1, "preview": preview("content")}
+
 @router.get("/history")
-async def get_chat_history(current_user: UserResponse = Depends(get_current_user)):
+async def get_chat_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Oldest-first chat history. fields=summary returns a short preview per
+    message; fetch GET /history/{message_id} for the full content.
+    The next page's cursor is returned in the X-Next-Cursor header.
+    """
     db = await get_database()
-    history = await db.chat_history.find({"user_id": current_user.id}).sort("timestamp", 1).to_list(100)
-    for h in history:
-        h["_id"] = str(h["_id"])
+    history, next_cursor = await paginate(
+        db.chat_history, {"user_id": current_user.id}, "timestamp", 1, limit, cursor,
+        CHAT_LIST_PROJECTION if fields == "summary" else None
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return history
 
+@router.get("/history/{message_id}")
+async def get_chat_message(message_id: str, current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    message = await db.chat_history.find_one({"_id": as_doc_id(message_id), "user_id": current_user.id})
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    message["_id"] = str(message["_id"])
+    return message
+
 @router.delete("/history")
 async def clear_chat_history(current_user: UserResponse = Depends(get_current_user)):
     db = await get_database()
     result = await db.chat_history.delete_many({"user_id": current_user.id})
+    await clear_memory(db, current_user.id)
     return {"status": "success", "deleted_count": result.deleted_count}
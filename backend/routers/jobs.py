@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from database import get_database
+from routers.auth import get_current_user
+from models import UserResponse
+from job_runner import get_job
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+@router.get("/")
+async def get_user_jobs(current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    jobs = await db.jobs.find(
+        {"user_id": current_user.id},
+        {"params": 0, "owner": 0, "result": 0}
+    ).sort("created_at", -1).to_list(20)
+    return jobs
+
+@router.get("/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    job = await get_job(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Query, Response
 from typing import List, Optional
 import os
 import uuid
@@ -8,8 +8,9 @@ from database import get_database
 from bson import ObjectId
 from routers.auth import get_current_user
 from models import UserResponse
-from ai_client import client
+from ai_client import async_client
 from ocr_utils import get_reader
+from utils.pagination import paginate, as_doc_id, NEXT_CURSOR_HEADER
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/math", tags=["Math"])
@@ -24,7 +25,7 @@ class MathTextRequest(BaseModel):
 
 async def refine_math_ocr(raw_text: str) -> str:
     """Uses AI to clean up OCR results into valid LaTeX/Math format."""
-    if not client or not raw_text.strip():
+    if not async_client or not raw_text.strip():
         return raw_text
     
     prompt = (
@@ -36,7 +37,7 @@ async def refine_math_ocr(raw_text: str) -> str:
     )
     
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=300
@@ -48,7 +49,7 @@ async def refine_math_ocr(raw_text: str) -> str:
 
 async def get_pro_solution(expression: str) -> str:
     """Gets a detailed, step-by-step mathematical solution from the AI."""
-    if not client:
+    if not async_client:
         return "AI Solver is currently offline."
     
     prompt = (
@@ -65,13 +66,13 @@ async def get_pro_solution(expression: str) -> str:
     )
     
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
             messages=[
                 {"role": "system", "content": "You are a professional mathematician and tutor. You provide clear, rigorous, and easy-to-understand solutions."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=client.default_max_tokens
+            max_tokens=async_client.default_max_tokens
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -164,14 +165,39 @@ async def solve_from_text(
         print(f"Math Text Pipeline Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to solve math expression.")
 
+MATH_LIST_PROJECTION = {"expression": 1, "type": 1, "created_at": 1}
+
 @router.get("/history")
-async def get_math_history(current_user: UserResponse = Depends(get_current_user)):
+async def get_math_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Newest-first solved problems. fields=summary omits the solution body;
+    fetch GET /{math_id} for it. The next page's cursor is returned in the
+    X-Next-Cursor header.
+    """
     db = await get_database()
-    history = await db.math_solutions.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    for item in history:
-        item["_id"] = str(item["_id"])
+    history, next_cursor = await paginate(
+        db.math_solutions, {"user_id": current_user.id}, "created_at", -1, limit, cursor,
+        MATH_LIST_PROJECTION if fields == "summary" else None
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return history
 
+@router.get("/{math_id}")
+async def get_math_item(math_id: str, current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    item = await db.math_solutions.find_one({"_id": as_doc_id(math_id), "user_id": current_user.id})
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    item["_id"] = str(item["_id"])
+    return item
+
 @router.delete("/{math_id}")
 async def delete_math_item(
     math_id: str,
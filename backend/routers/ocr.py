@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Query, Response
 from typing import List, Optional
 import os
 import uuid
@@ -9,8 +9,9 @@ from database import get_database
 from bson import ObjectId
 from routers.auth import get_current_user
 from models import UserResponse
-from ai_client import client
+from ai_client import async_client
 from ocr_utils import get_reader
+from utils.pagination import paginate, preview, as_doc_id, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/api/ocr", tags=["OCR"])
 
@@ -21,7 +22,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 async def perform_vision_ocr(content: bytes, mime_type: str, mode: str) -> str:
     """Uses AI Vision to extract text from an image with layout awareness."""
-    if not client:
+    if not async_client:
         return ""
     
     base64_image = base64.b64encode(content).decode('utf-8')
@@ -38,7 +39,7 @@ async def perform_vision_ocr(content: bytes, mime_type: str, mode: str) -> str:
         user_prompt = "Please accurately transcribe all handwritten text in this image. Do not add any commentary. Output ONLY the text found."
 
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="google/gemini-2.0-flash-001", 
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -53,7 +54,7 @@ async def perform_vision_ocr(content: bytes, mime_type: str, mode: str) -> str:
                     ]
                 }
             ],
-            max_tokens=client.default_max_tokens
+            max_tokens=async_client.default_max_tokens
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
@@ -118,15 +119,40 @@ async def recognize_handwriting(
         print(f"OCR Pipeline Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to process image OCR.")
 
+OCR_LIST_PROJECTION = {"title": 1, "type": 1, "mode": 1, "created_at": 1, "preview": preview("text")}
+
 @router.get("/history")
-async def get_ocr_history(current_user: UserResponse = Depends(get_current_user)):
+async def get_ocr_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Newest-first OCR history. fields=summary returns a short text preview;
+    fetch GET /{ocr_id} for the full text. The next page's cursor is
+    returned in the X-Next-Cursor header.
+    """
     db = await get_database()
     # Using 'ocr' collection as per previous logic, but ensuring it's queried by user
-    history = await db.ocr.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    for item in history:
-        item["_id"] = str(item["_id"])
+    history, next_cursor = await paginate(
+        db.ocr, {"user_id": current_user.id}, "created_at", -1, limit, cursor,
+        OCR_LIST_PROJECTION if fields == "summary" else None
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return history
 
+@router.get("/{ocr_id}")
+async def get_ocr_item(ocr_id: str, current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    item = await db.ocr.find_one({"_id": as_doc_id(ocr_id), "user_id": current_user.id})
+    if not item:
+        raise HTTPException(status_code=404, detail="OCR record not found.")
+    item["_id"] = str(item["_id"])
+    return item
+
 @router.delete("/{ocr_id}")
 async def delete_ocr_item(
     ocr_id: str,
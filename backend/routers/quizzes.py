@@ -1,5 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Query, Response
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
 import os
 import uuid
 from datetime import datetime
@@ -7,8 +9,10 @@ from database import get_database
 from bson import ObjectId
 from routers.auth import get_current_user
 from models import UserResponse
-from ai_client import client
+from ai_client import async_client
 import PyPDF2
+from utils.pagination import paginate, as_doc_id, NEXT_CURSOR_HEADER
+from utils.ttl_cache import TTLCache
 import json
 
 router = APIRouter(prefix="/api/quizzes", tags=["Quizzes"])
@@ -16,21 +20,86 @@ router = APIRouter(prefix="/api/quizzes", tags=["Quizzes"])
 UPLOAD_DIR = "uploads/docs"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# DeepSeek Client is imported as 'client'
+# DeepSeek Client is imported as 'async_client'
 
-def extract_text(file_path):
+# Characters of source text sent to the model
+QUIZ_SOURCE_CHARS = int(os.getenv("QUIZ_SOURCE_CHARS", 4000))
+# Longer PDFs are sampled: this many evenly spaced pages share the budget
+QUIZ_PDF_SAMPLE_PAGES = int(os.getenv("QUIZ_PDF_SAMPLE_PAGES", 6))
+# Extracted text per (file hash, budget), so re-uploads skip PDF parsing
+extracted_text_cache = TTLCache(maxsize=int(os.getenv("QUIZ_TEXT_CACHE_SIZE", 128)), ttl=3600)
+
+def sample_pages(page_count: int, samples: int = QUIZ_PDF_SAMPLE_PAGES) -> List[int]:
+    """Page indexes to read: all of a short document, else evenly spaced pages."""
+    if page_count <= samples:
+        return list(range(page_count))
+    step = page_count / samples
+    return [int(i * step + step / 2) for i in range(samples)]
+
+def iter_pdf_pages(pdf: PyPDF2.PdfReader, pages: Iterable[int], known: Optional[Dict[int, str]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yields (index, text) of the given pages, parsing each only when
+    reached. Pages with text in `known` are served from it instead.
+    """
+    for index in pages:
+        if known and index in known:
+            yield index, known.pop(index)
+        else:
+            yield index, pdf.pages[index].extract_text() or ""
+
+def extract_text(file_path, max_chars: int = QUIZ_SOURCE_CHARS):
+    """
+    Up to max_chars of a document's text. PDFs are parsed page by page and
+    reading stops once the budget is filled. The sampled pages are read
+    first, each getting an equal share of what is left of the budget, so
+    the quiz covers the whole document; budget they leave unused (short or
+    image-only pages) is then filled from the remaining text in page order.
+    """
     ext = os.path.splitext(file_path)[1].lower()
-    text = ""
     if ext == ".pdf":
+        parts: Dict[int, str] = {}
+        rest: Dict[int, str] = {}
+        used = 0
         with open(file_path, "rb") as f:
             pdf = PyPDF2.PdfReader(f)
-            for page in pdf.pages:
-                text += page.extract_text()
+            sampled = sample_pages(len(pdf.pages))
+            for position, (index, text) in enumerate(iter_pdf_pages(pdf, sampled)):
+                share = -(-(max_chars - used) // (len(sampled) - position))
+                parts[index], rest[index] = text[:share], text[share:]
+                used += len(parts[index])
+
+            remaining = iter_pdf_pages(pdf, range(len(pdf.pages)), rest)
+            while used < max_chars:
+                index, text = next(remaining, (None, None))
+                if index is None:
+                    break
+                part = text[:max_chars - used]
+                parts[index] = parts.get(index, "") + part
+                used += len(part)
+        return "".join(parts[index] for index in sorted(parts))
     elif ext in [".txt", ".docx"]:
         with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
+            return f.read(max_chars)
+    return ""
+
+async def extract_text_cached(file_path: str, file_hash: str, max_chars: int = QUIZ_SOURCE_CHARS) -> str:
+    """extract_text in a worker thread, cached per file content hash."""
+    key = (file_hash, os.path.splitext(file_path)[1].lower(), max_chars)
+    text = extracted_text_cache.get(key)
+    if text is None:
+        text = await asyncio.to_thread(extract_text, file_path, max_chars)
+        extracted_text_cache.set(key, text)
     return text
 
+def save_upload(upload: UploadFile, file_path: str) -> str:
+    """Writes an upload to disk and returns the sha256 of its content."""
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        while chunk := upload.file.read(1 << 20):
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
 @router.post("/generate")
 async def generate_quiz(
     file: Optional[UploadFile] = File(None),
@@ -45,10 +114,11 @@ async def generate_quiz(
         file_id = str(uuid.uuid4())
         file_ext = os.path.splitext(file.filename)[1]
         file_path = f"{UPLOAD_DIR}/{file_id}{file_ext}"
-        with open(file_path, "wb") as buffer:
-            import shutil
-            shutil.copyfileobj(file.file, buffer)
-        source_text += extract_text(file_path)
+        file_hash = await asyncio.to_thread(save_upload, file, file_path)
+        # Only the first QUIZ_SOURCE_CHARS reach the prompt, so extract no more
+        budget = QUIZ_SOURCE_CHARS - len(source_text)
+        if budget > 0:
+            source_text += await extract_text_cached(file_path, file_hash, budget)
     
     if not source_text:
         raise HTTPException(status_code=400, detail="No content provided")
@@ -71,18 +141,18 @@ async def generate_quiz(
       ]
     }}
     
-    Content: {source_text[:4000]}
+    Content: {source_text[:QUIZ_SOURCE_CHARS]}
     """
 
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
             messages=[
                 {"role": "system", "content": "You are a specialized quiz generator. Return ONLY valid JSON."},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"},
-            max_tokens=client.default_max_tokens
+            max_tokens=async_client.default_max_tokens
         )
         
         quiz_data = json.loads(response.choices[0].message.content)
@@ -107,10 +177,38 @@ async def generate_quiz(
         print(f"Quiz Generation Error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate quiz: {str(e)}")
 
+QUIZ_LIST_PROJECTION = {
+    "title": 1, "difficulty": 1, "created_at": 1,
+    "question_count": {"$size": {"$ifNull": ["$questions", []]}}
+}
+
 @router.get("/")
-async def get_user_quizzes(current_user: UserResponse = Depends(get_current_user)):
+async def get_user_quizzes(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Newest-first quizzes. fields=summary omits the questions; fetch
+    GET /{quiz_id} for them. The next page's cursor is returned in the
+    X-Next-Cursor header.
+    """
     db = await get_database()
-    quizzes = await db.quizzes.find({"user_id": current_user.id}).to_list(100)
-    for q in quizzes:
-        q["_id"] = str(q["_id"])
+    quizzes, next_cursor = await paginate(
+        db.quizzes, {"user_id": current_user.id}, "created_at", -1, limit, cursor,
+        QUIZ_LIST_PROJECTION if fields == "summary" else None
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return quizzes
+
+@router.get("/{quiz_id}")
+async def get_quiz(quiz_id: str, current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    quiz = await db.quizzes.find_one({"_id": as_doc_id(quiz_id), "user_id": current_user.id})
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    quiz["_id"] = str(quiz["_id"])
+    return quiz
@@ -1,5 +1,6 @@
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 import os
 import shutil
 import uuid
@@ -7,24 +8,21 @@ from database import get_database
 from bson import ObjectId
 from routers.auth import get_current_user
 from models import UserResponse
-from ai_client import client
-from utils.video_utils import extract_frames
-from ocr_utils import get_reader
+from ai_client import async_client
+from utils.video_utils import extract_frames, dedupe_frames
+from ocr_utils import ocr_images
+from job_runner import submit_job, register_job_handler, run_cpu, noop_progress
 
 router = APIRouter(prefix="/api/vdo-ocr", tags=["Video OCR"])
 
 PROCESSED_FRAMES_DIR = "uploads/frames"
 os.makedirs(PROCESSED_FRAMES_DIR, exist_ok=True)
 
-@router.post("/{video_id}")
-async def extract_text_from_video(
-    video_id: str,
-    current_user: UserResponse = Depends(get_current_user)
-):
+async def run_video_ocr(user_id: str, video_id: str, progress=noop_progress) -> dict:
     db = await get_database()
     
     # Try finding by ObjectId if valid, else by string
-    video_filter = {"user_id": current_user.id}
+    video_filter = {"user_id": user_id}
     try:
         video_filter["_id"] = ObjectId(video_id)
     except:
@@ -44,26 +42,37 @@ async def extract_text_from_video(
     temp_frames_dir = os.path.join(PROCESSED_FRAMES_DIR, job_id)
     
     try:
-        # 2. Extract frames (every 10 seconds)
-        frame_paths = extract_frames(video_path, temp_frames_dir, interval=10)
+        # 2. Extract frames (every 10 seconds) in the CPU process pool
+        await progress("extracting_frames", 0.05)
+        frame_paths = await run_cpu(extract_frames, video_path, temp_frames_dir, 10)
         
         if not frame_paths:
             return {"text": "No frames could be extracted from this video.", "video_id": video_id}
 
-        # 3. Perform OCR on each frame
+        # 3. Drop repeated frames (same slide) before OCR
+        await progress("deduplicating", 0.1)
+        segments = await run_cpu(dedupe_frames, frame_paths, 10)
+        print(f"DEBUG: Video OCR on {len(segments)} unique frames out of {len(frame_paths)}")
+
+        # 4. OCR the unique frames in parallel across the OCR process pool
+        async def report_ocr(done, total):
+            await progress("ocr", 0.15 + 0.65 * done / total)
+
+        frame_texts = await ocr_images([segment["path"] for segment in segments], report_ocr)
+
         all_text_blocks = []
-        reader = get_reader()
-        for frame_path in frame_paths:
-            results = reader.readtext(frame_path)
-            frame_text = " ".join([res[1] for res in results])
+        ocr_segments = []
+        for segment, frame_text in zip(segments, frame_texts):
             if frame_text.strip():
                 all_text_blocks.append(frame_text)
+                ocr_segments.append({"start": segment["start"], "end": segment["end"], "text": frame_text})
                 
-        # 4. Refine and De-duplicate with AI
+        # 5. Refine and De-duplicate with AI
+        await progress("refining", 0.85)
         combined_raw_text = "\n---\n".join(all_text_blocks)
         
         refined_text = "No text detected in video."
-        if combined_raw_text.strip() and client:
+        if combined_raw_text.strip() and async_client:
             try:
                 prompt = (
                     "The following text blocks were extracted from different frames of a video lecture using OCR. "
@@ -73,23 +82,23 @@ async def extract_text_from_video(
                     f"{combined_raw_text[:6000]}" # Limit to avoid token issues
                 )
                 
-                response = client.chat.completions.create(
+                response = await async_client.chat.completions.create(
                     model="deepseek/deepseek-chat",
                     messages=[
                         {"role": "system", "content": "You are a specialist in analyzing and cleaning up OCR data from video lectures."},
                         {"role": "user", "content": prompt}
                     ],
-                    max_tokens=client.default_max_tokens
+                    max_tokens=async_client.default_max_tokens
                 )
                 refined_text = response.choices[0].message.content.strip()
             except Exception as ai_err:
                 print(f"AI Video OCR Refinement Error: {ai_err}")
                 refined_text = combined_raw_text # Fallback to raw if AI fails
                 
-        # 5. Save results to DB
+        # 6. Save results to DB
         await db.videos.update_one(
             video_filter,
-            {"$set": {"video_ocr_text": refined_text}}
+            {"$set": {"video_ocr_text": refined_text, "video_ocr_segments": ocr_segments}}
         )
         
         # Cleanup temp frames
@@ -97,6 +106,9 @@ async def extract_text_from_video(
         
         return {
             "text": refined_text,
+            "segments": ocr_segments,
+            "frames_sampled": len(frame_paths),
+            "frames_ocrd": len(segments),
             "video_id": video_id
         }
         
@@ -104,3 +116,26 @@ async def extract_text_from_video(
         print(f"Video OCR Error: {e}")
         shutil.rmtree(temp_frames_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Video OCR failed: {str(e)}")
+
+@register_job_handler("video_ocr")
+async def video_ocr_job(job, user_id: str, video_id: str):
+    return await run_video_ocr(user_id, video_id, progress=job.progress)
+
+@router.post("/{video_id}")
+async def extract_text_from_video(
+    video_id: str,
+    background: bool = False,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Runs OCR over sampled frames of an uploaded video. With
+    ?background=true the work is queued and the response is {job_id}.
+    """
+    if not background:
+        return await run_video_ocr(current_user.id, video_id)
+
+    job_id = await submit_job(current_user.id, "video_ocr", {
+        "user_id": current_user.id,
+        "video_id": video_id
+    })
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Form
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks, Form, Query, Response
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Tuple
 import shutil
 import os
+import asyncio
+import time
 import uuid
 from datetime import datetime
 from database import get_database
 from routers.auth import get_current_user
 from models import UserResponse
-from ai_client import client
+from ai_client import async_client
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 from utils.video_utils import extract_audio, download_youtube_audio
 from bson import ObjectId
+from transcript_store import get_cached_transcript, save_transcript
+from utils.pagination import paginate, preview, NEXT_CURSOR_HEADER
+from utils.streaming import sse_event, sse_response, stream_completion
+from job_runner import submit_job, register_job_handler, run_cpu, noop_progress
+from summary_cache import get_cached_summary, set_cached_summary, invalidate_summaries
+from summarizer import build_map_reduce_context, delete_partial_summaries
+from answer_cache import embed_question, get_cached_answer, set_cached_answer
 
 router = APIRouter(prefix="/api/videos", tags=["Videos"])
 
@@ -20,6 +30,8 @@ AUDIO_DIR = "uploads/audio"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+SUMMARY_MODEL = "deepseek/deepseek-chat"
+
 # --- Helper Functions ---
 
 def extract_video_id(url: str) -> Optional[str]:
@@ -36,237 +48,282 @@ def extract_video_id(url: str) -> Optional[str]:
             return query.path.split('/')[2]
     return None
 
+def _segments_to_dicts(segments) -> List[dict]:
+    return [
+        {"text": t['text'], "start": t.get('start', 0), "duration": t.get('duration', 0)}
+        for t in segments
+    ]
+
+def _fetch_caption_transcript(video_id: str) -> Tuple[List[dict], str, str]:
+    """
+    Fetches captions through YouTubeTranscriptApi.
+    Returns (segments, language, source). Blocking - run in a worker thread.
+    """
+    # Step 1A: Try Official Transcript
+    try:
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
+        print(f"DEBUG: Fetched official transcript for {video_id}")
+        return _segments_to_dicts(transcript_list), "en", "official"
+    except Exception as e:
+        print(f"DEBUG: Official transcript failed for {video_id}: {e}")
+
+    # Step 1B: Try list_transcripts fallback
+    transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+    try:
+        transcript = transcripts.find_manually_created_transcript()
+        segments = transcript.fetch()
+        print(f"DEBUG: Fetched manual transcript for {video_id}")
+        return _segments_to_dicts(segments), transcript.language_code, "manual"
+    except:
+        pass
+    try:
+        transcript = transcripts.find_generated_transcript(['en'])
+        segments = transcript.fetch()
+        print(f"DEBUG: Fetched auto-generated transcript for {video_id}")
+        return _segments_to_dicts(segments), transcript.language_code, "generated"
+    except:
+        pass
+    # Final Step 1 Fallback: Pick first available
+    transcript = next(iter(transcripts))
+    segments = transcript.fetch()
+    print(f"DEBUG: Fetched first available transcript for {video_id}")
+    return _segments_to_dicts(segments), transcript.language_code, "first_available"
+
+async def _transcribe_youtube_audio(video_id: str, url: str) -> str:
+    """DeepSeek Transcription Fallback (Free alternative to Whisper)."""
+    from utils.video_utils import transcribe_audio_with_deepseek
+
+    # Generate a unique filename for the audio
+    audio_id = str(uuid.uuid4())
+    audio_base = os.path.join(AUDIO_DIR, audio_id)
+
+    # Download audio
+    print(f"DEBUG: Downloading audio for {video_id}...")
+    audio_path = await asyncio.to_thread(download_youtube_audio, url, audio_base)
+
+    if not audio_path or not os.path.exists(audio_path):
+        raise Exception("Failed to download audio for transcription")
+
+    # Transcribe with DeepSeek
+    print("DEBUG: Transcribing with DeepSeek...")
+    text = await transcribe_audio_with_deepseek(audio_path)
+
+    # Cleanup
+    if os.path.exists(audio_path):
+        os.remove(audio_path)
+
+    if not text:
+        raise Exception("DeepSeek transcription returned empty text")
+
+    print("DEBUG: DeepSeek transcription successful")
+    return text
+
+async def fetch_youtube_transcript(video_id: str, url: str) -> dict:
+    """
+    Returns {'text', 'language', 'source', 'segments'} for a YouTube video.
+    The transcript cache is consulted first so repeat submissions skip both
+    the caption API and the ASR fallback.
+    """
+    cached = await get_cached_transcript(video_id)
+    if cached and cached.get("text"):
+        print(f"DEBUG: Transcript cache hit for {video_id} ({cached['language']}/{cached['source']})")
+        return cached
+
+    try:
+        segments, language, source = await asyncio.to_thread(_fetch_caption_transcript, video_id)
+        text = " ".join([t['text'] for t in segments])
+    except Exception as transcript_err:
+        print(f"DEBUG: All transcript methods failed: {transcript_err}")
+        print("DEBUG: Attempting DeepSeek Transcription Fallback...")
+        try:
+            text = await _transcribe_youtube_audio(video_id, url)
+            segments, language, source = [], "en", "asr"
+        except Exception as deepseek_err:
+            print(f"DEBUG: DeepSeek fallback failed: {deepseek_err}")
+            raise HTTPException(
+                status_code=404, 
+                detail="No transcript available for this video. The video may not have captions enabled, and audio transcription failed."
+            )
+
+    if text:
+        try:
+            await save_transcript(video_id, text, language, source, segments)
+        except Exception as e:
+            print(f"WARNING: Failed to cache transcript for {video_id}: {e}")
+
+    return {"text": text, "language": language, "source": source, "segments": segments}
+
 async def restore_punctuation(text: str) -> str:
-    if not client or not text.strip():
+    if not async_client or not text.strip():
         return text
     try:
-        response = client.chat.completions.create(
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
             messages=[
                 {"role": "system", "content": "You are a professional editor. Restore punctuation and capitalization to the following transcript. Keep the original words exactly as they are."},
                 {"role": "user", "content": text[:4000]}
             ],
-            max_tokens=client.default_max_tokens
+            max_tokens=async_client.default_max_tokens
         )
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Punctuation Error: {e}")
         return text
 
-async def generate_ai_summary(text: str, summary_type: str) -> str:
-    if not client:
-        return "AI Summarization is currently unavailable (Client not initialized)."
-    
+def build_summary_prompt(text: str, summary_type: str) -> str:
     if summary_type == "brief":
-        prompt = f"Provide a concise summary (3-5 core sentences) of the following content:\n\n{text}"
+        return f"Provide a concise summary (3-5 core sentences) of the following content:\n\n{text}"
     elif summary_type == "bullet":
-        prompt = f"Extract 5-10 key points as bullet points from the following content:\n\n{text}"
+        return f"Extract 5-10 key points as bullet points from the following content:\n\n{text}"
     else: # detailed
-        prompt = f"Provide a comprehensive summary of the following content, covering the main topics, key arguments, and final conclusions:\n\n{text}"
+        return f"Provide a comprehensive summary of the following content, covering the main topics, key arguments, and final conclusions:\n\n{text}"
+
+def build_summary_messages(text: str, summary_type: str) -> List[dict]:
+    return [
+        {"role": "system", "content": "You are a helpful education assistant specialized in lecture summarization."},
+        {"role": "user", "content": build_summary_prompt(text, summary_type)}
+    ]
+
+async def request_ai_summary(text: str, summary_type: str) -> str:
+    """Calls the LLM for a summary. Raises on failure so callers can decide what to cache."""
+    response = await async_client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=build_summary_messages(text, summary_type),
+        max_tokens=async_client.default_max_tokens
+    )
+    return response.choices[0].message.content.strip()
+
+async def generate_ai_summary(text: str, summary_type: str) -> str:
+    if not async_client:
+        return "AI Summarization is currently unavailable (Client not initialized)."
 
     try:
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a helpful education assistant specialized in lecture summarization."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=client.default_max_tokens
-        )
-        return response.choices[0].message.content.strip()
+        return await request_ai_summary(text, summary_type)
     except Exception as e:
         print(f"Summary Generation Error: {e}")
         return f"Error generating {summary_type} summary."
 
-# --- Endpoints ---
-
-@router.post("/upload")
-async def upload_video(
-    file: UploadFile = File(...),
-    current_user: UserResponse = Depends(get_current_user)
-):
-    if not file.content_type.startswith("video/"):
-        raise HTTPException(status_code=400, detail="File must be a video")
-    
-    file_id = str(uuid.uuid4())
-    file_ext = os.path.splitext(file.filename)[1]
-    file_path = f"{UPLOAD_DIR}/{file_id}{file_ext}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    db = await get_database()
-    video_doc = {
-        "user_id": current_user.id,
-        "title": file.filename,
-        "file_path": file_path,
-        "status": "uploaded",
-        "created_at": datetime.utcnow()
-    }
-    
-    result = await db.videos.insert_one(video_doc)
-    return {
-        "id": str(result.inserted_id),
-        "filename": file.filename,
-        "status": "uploaded"
-    }
-
-@router.get("/")
-async def get_user_videos(current_user: UserResponse = Depends(get_current_user)):
-    db = await get_database()
-    videos = await db.videos.find({"user_id": current_user.id}).sort("created_at", -1).to_list(100)
-    for v in videos:
-        v["_id"] = str(v["_id"])
-    return videos
-
-@router.post("/youtube")
-async def summarize_youtube(
-    url: str = Form(...),
-    summary_type: str = Form("detailed"),
-    current_user: UserResponse = Depends(get_current_user)
-):
-    video_id = extract_video_id(url)
-    if not video_id:
-        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-
-    # 1. Fetch Transcript with Multi-Method Fallback
-    summary = None
-    clean_text = None
-    
-    try:
-        # Step 1A: Try Official Transcript
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-            clean_text = " ".join([t['text'] for t in transcript_list])
-            print(f"DEBUG: Fetched official transcript for {video_id}")
-        except Exception as e:
-            print(f"DEBUG: Official transcript failed for {video_id}: {e}")
-            # Step 1B: Try list_transcripts fallback
-            transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
-            try:
-                transcript = transcripts.find_manually_created_transcript()
-                clean_text = " ".join([t['text'] for t in transcript.fetch()])
-                print(f"DEBUG: Fetched manual transcript for {video_id}")
-            except:
-                try:
-                    transcript = transcripts.find_generated_transcript(['en'])
-                    clean_text = " ".join([t['text'] for t in transcript.fetch()])
-                    print(f"DEBUG: Fetched auto-generated transcript for {video_id}")
-                except:
-                    # Final Step 1 Fallback: Pick first available
-                    transcript = next(iter(transcripts))
-                    clean_text = " ".join([t['text'] for t in transcript.fetch()])
-                    print(f"DEBUG: Fetched first available transcript for {video_id}")
-
-    except Exception as transcript_err:
-        print(f"DEBUG: All transcript methods failed: {transcript_err}")
-        print("DEBUG: Attempting DeepSeek Transcription Fallback...")
-        
-        # Step 2: DeepSeek Transcription Fallback (Free alternative to Whisper)
-        try:
-            from utils.video_utils import transcribe_audio_with_deepseek
-            
-            # Generate a unique filename for the audio
-            audio_id = str(uuid.uuid4())
-            audio_base = os.path.join(AUDIO_DIR, audio_id)
-            
-            # Download audio
-            print(f"DEBUG: Downloading audio for {video_id}...")
-            audio_path = download_youtube_audio(url, audio_base)
-            
-            if not audio_path or not os.path.exists(audio_path):
-                raise Exception("Failed to download audio for transcription")
-                
-            # Transcribe with DeepSeek
-            print("DEBUG: Transcribing with DeepSeek...")
-            clean_text = transcribe_audio_with_deepseek(audio_path)
-            
-            if not clean_text:
-                raise Exception("DeepSeek transcription returned empty text")
-                
-            print("DEBUG: DeepSeek transcription successful")
-            
-            # Cleanup
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-                
-        except Exception as deepseek_err:
-            print(f"DEBUG: DeepSeek fallback failed: {deepseek_err}")
-            raise HTTPException(
-                status_code=404, 
-                detail="No transcript available for this video. The video may not have captions enabled, and audio transcription failed."
-            )
+async def index_youtube_transcript(video_id: str, url: str, progress=noop_progress) -> Tuple[dict, int]:
+    """
+    Fetches the transcript and stores its chunks in the vector DB.
+    Returns (transcript, chunk_count); see fetch_youtube_transcript().
+    """
+    # 1. Fetch Transcript (cache first, then multi-method fallback)
+    await progress("transcript", 0.1)
+    transcript = await fetch_youtube_transcript(video_id, url)
+    clean_text = transcript["text"]
 
     if not clean_text:
         raise HTTPException(status_code=404, detail="No transcript or audio content found.")
 
     # 2. RAG Pipeline: Chunk, Embed, Store
-    from utils.embedding_utils import chunk_text
-    from vector_store import store_video_chunks, retrieve_relevant_chunks
+    from utils.embedding_utils import iter_transcript_chunks
+    from vector_store import store_video_chunks_async
     
+    await progress("indexing", 0.4)
     print(f"DEBUG: Chunking transcript for {video_id}...")
-    chunks = chunk_text(clean_text, max_tokens=1000, overlap=100)
-    print(f"DEBUG: Created {len(chunks)} chunks")
+    # Timed segments keep each chunk's position in the video; ASR text has none
+    chunks = iter_transcript_chunks(transcript.get("segments") or clean_text, max_tokens=1000, overlap=100)
     
-    # Store chunks with embeddings
+    # Store chunks with embeddings; unchanged chunks from an earlier run are
+    # kept without re-embedding and chunks that no longer exist are removed
     try:
         # Use local embeddings (free) instead of OpenAI to avoid quota issues
-        chunk_count = store_video_chunks(video_id, chunks, use_openai_embeddings=False)
-        print(f"DEBUG: Stored {chunk_count} chunks in vector DB")
+        counts = await store_video_chunks_async(video_id, chunks, use_openai_embeddings=False)
+        chunk_count = counts["added"] + counts["unchanged"]
+        print(f"DEBUG: Stored {chunk_count} chunks in vector DB ({counts})")
     except Exception as e:
         print(f"WARNING: Failed to store chunks: {e}. Proceeding without RAG.")
         chunk_count = 0
 
-    # 3. Retrieve relevant chunks for summarization
-    # For summarization, we want a broad overview, so retrieve more chunks
-    if chunk_count > 0:
-        try:
-            # Use a generic query to get diverse chunks (using local embeddings)
-            summary_query = f"Provide a {summary_type} summary of the main topics and key points"
-            relevant_chunks = retrieve_relevant_chunks(video_id, summary_query, top_k=min(10, chunk_count), use_openai_embeddings=False)
-            context_text = "\n\n".join([f"[Segment {i+1}]\n{chunk['text']}" for i, chunk in enumerate(relevant_chunks)])
-            print(f"DEBUG: Retrieved {len(relevant_chunks)} chunks for summarization")
-        except Exception as e:
-            print(f"WARNING: Failed to retrieve chunks: {e}. Using full text.")
-            context_text = clean_text[:10000]  # Limit to avoid token overflow
-    else:
-        # Fallback to original behavior if RAG failed
-        context_text = clean_text[:10000]
+    return transcript, chunk_count
+
+async def build_summary_context(video_id: str, transcript: dict) -> str:
+    """Picks the transcript text the summary prompt is built from."""
+    # 3. Map-reduce: long transcripts are summarized part by part (parts are
+    # shared across summary types), short ones are used as they are
+    try:
+        return await build_map_reduce_context(video_id, transcript, SUMMARY_MODEL)
+    except Exception as e:
+        print(f"WARNING: Partial summaries failed: {e}. Using truncated text.")
+        return transcript["text"][:10000]  # Limit to avoid token overflow
+
+async def summarize_indexed_transcript(video_id: str, transcript: dict, summary_type: str) -> str:
+    """Summarizes an indexed transcript, filling the summary cache."""
+    if not async_client:
+        return "AI Summarization is currently unavailable (Client not initialized)."
+    context_text = await build_summary_context(video_id, transcript)
 
-    # 4. Generate AI summary with retrieved context
-    summary = await generate_ai_summary(context_text, summary_type)
+    # 4. Reduce: generate the requested summary type from the context
+    try:
+        summary = await request_ai_summary(context_text, summary_type)
+    except Exception as e:
+        print(f"Summary Generation Error: {e}")
+        return f"Error generating {summary_type} summary."
 
+    try:
+        await set_cached_summary(video_id, summary_type, SUMMARY_MODEL, summary)
+    except Exception as e:
+        print(f"WARNING: Failed to cache summary for {video_id}: {e}")
+    return summary
+
+async def save_youtube_summary(user_id: str, video_id: str, url: str, summary: str, summary_type: str) -> dict:
+    """Inserts the per-user history entry for a YouTube summary."""
     db = await get_database()
     video_doc = {
         "_id": str(uuid.uuid4()),
-        "user_id": current_user.id,
+        "user_id": user_id,
         "title": f"YouTube: {video_id}",
         "url": url,
         "type": "youtube",
         "status": "summarized",
         "summary": summary,
         "summary_type": summary_type,
+        "youtube_id": video_id,
         "created_at": datetime.utcnow()
     }
     await db.videos.insert_one(video_doc)
-    return {**video_doc, "_id": video_doc["_id"]}
+    return video_doc
 
-@router.post("/{video_id}/summarize")
-async def summarize_local_video(
-    video_id: str,
-    summary_type: str = Form("detailed"),
-    current_user: UserResponse = Depends(get_current_user)
-):
-    db = await get_database()
-    
-    # Try finding by ObjectId if valid, else by string
-    video_filter = {"user_id": current_user.id}
+async def run_youtube_summary(user_id: str, url: str, summary_type: str, progress=noop_progress) -> dict:
+    """Full YouTube pipeline: cache check, transcript, indexing, summary, history entry."""
+    video_id = extract_video_id(url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+
+    # 0. Shared summary cache: reuse an existing summary if the video is still indexed
+    summary = await get_cached_summary(video_id, summary_type, SUMMARY_MODEL)
+    if summary is not None:
+        from vector_store import get_video_chunk_count
+        if await asyncio.to_thread(get_video_chunk_count, video_id) > 0:
+            print(f"DEBUG: Summary cache hit for {video_id} ({summary_type})")
+        else:
+            # Index was lost; rebuild it but keep the cached summary
+            await index_youtube_transcript(video_id, url, progress)
+    else:
+        transcript, _ = await index_youtube_transcript(video_id, url, progress)
+        await progress("summarizing", 0.7)
+        summary = await summarize_indexed_transcript(video_id, transcript, summary_type)
+
+    await progress("saving", 0.95)
+    return await save_youtube_summary(user_id, video_id, url, summary, summary_type)
+
+@register_job_handler("youtube_summary")
+async def youtube_summary_job(job, user_id: str, url: str, summary_type: str):
+    return await run_youtube_summary(user_id, url, summary_type, progress=job.progress)
+
+async def find_user_video(db, video_id: str, user_id: str) -> Tuple[Optional[dict], dict]:
+    """Looks a video up by ObjectId or string id. Returns (video, filter)."""
+    video_filter = {"user_id": user_id}
     try:
         video_filter["_id"] = ObjectId(video_id)
     except:
         video_filter["_id"] = video_id
-        
-    video = await db.videos.find_one(video_filter)
+    return await db.videos.find_one(video_filter), video_filter
+
+async def run_local_video_summary(user_id: str, video_id: str, summary_type: str, progress=noop_progress) -> dict:
+    db = await get_database()
+    video, video_filter = await find_user_video(db, video_id, user_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
 
@@ -277,14 +334,16 @@ async def summarize_local_video(
     audio_path = os.path.join(AUDIO_DIR, f"{video_id}.mp3")
     
     try:
-        # 1. Extract Audio
+        # 1. Extract Audio (CPU-bound, runs in the job process pool)
         if not os.path.exists(audio_path):
-            success = extract_audio(video_path, audio_path)
+            await progress("extracting_audio", 0.1)
+            success = await run_cpu(extract_audio, video_path, audio_path)
             if not success:
                 raise Exception("Failed to extract audio from video")
 
         # 2. Transcription Pipeline (Mocked Placeholder for Whisper)
         # Note: In a production setup, we would call OpenAI Whisper API or a local model here.
+        await progress("transcribing", 0.4)
         transcript_placeholder = (
             f"This is a simulated high-quality transcript for the lecture '{video.get('title')}'. "
             "In this video, the instructor discusses advanced concepts of software architecture and "
@@ -294,6 +353,7 @@ async def summarize_local_video(
         )
 
         # 3. Summarize
+        await progress("summarizing", 0.6)
         summary = await generate_ai_summary(transcript_placeholder, summary_type)
 
         # 4. Update Database
@@ -315,71 +375,86 @@ async def summarize_local_video(
         print(f"Local Video Summary Error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process video: {str(e)}")
 
-@router.post("/{video_id}/ask")
-async def ask_video_question(
-    video_id: str,
-    question: str = Form(...),
-    current_user: UserResponse = Depends(get_current_user)
-):
+@register_job_handler("local_video_summary")
+async def local_video_summary_job(job, user_id: str, video_id: str, summary_type: str):
+    return await run_local_video_summary(user_id, video_id, summary_type, progress=job.progress)
+
+# Hybrid retrieval ranks exact-term hits well enough to keep Q&A prompts small
+QA_TOP_K = int(os.getenv("QA_TOP_K", 4))
+
+QA_SYSTEM_PROMPT = """You are a source-grounded research assistant analyzing video transcripts.
+
+CRITICAL RULES:
+1. Only use information from the provided transcript sources
+2. Do NOT add outside knowledge or assumptions
+3. If something is not in the sources, say: "Not mentioned in the provided transcript"
+4. Reference sources as [Source 1], [Source 2], etc.
+5. Be precise and information-dense
+6. Remove filler words from quotes
+
+Never hallucinate. Never invent details. Stay grounded in the transcript."""
+
+NO_RELEVANT_CHUNKS_ANSWER = "I couldn't find relevant information in the video transcript to answer this question."
+
+async def resolve_question_index(video_id: str, current_user: UserResponse) -> Tuple[str, Optional[str]]:
     """
-    Ask a question about a video's content using RAG retrieval.
-    Returns source-grounded answers based on transcript chunks.
+    Verifies ownership and indexing of a video. Returns the id its chunks
+    are indexed under and the content hash of its index (None for videos
+    indexed before manifests existed).
     """
-    from vector_store import retrieve_relevant_chunks, get_video_chunk_count
+    from vector_store import get_video_chunk_count, get_video_manifest
     
     db = await get_database()
     
     # Verify video exists and belongs to user
-    video_filter = {"user_id": current_user.id}
-    try:
-        video_filter["_id"] = ObjectId(video_id)
-    except:
-        video_filter["_id"] = video_id
-    
-    video = await db.videos.find_one(video_filter)
+    video, _ = await find_user_video(db, video_id, current_user.id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
+    # YouTube chunks are indexed under the YouTube id, uploads under the doc id
+    index_id = video.get("youtube_id") or video_id
+
     # Check if chunks exist for this video
-    chunk_count = get_video_chunk_count(video_id)
+    chunk_count = get_video_chunk_count(index_id)
     if chunk_count == 0:
         raise HTTPException(
             status_code=400, 
             detail="This video has not been processed with the RAG pipeline. Please re-summarize it first."
         )
-    
-    # Retrieve relevant chunks (using local embeddings)
+    manifest = get_video_manifest(index_id)
+    return index_id, manifest["content_hash"] if manifest else None
+
+async def retrieve_question_chunks(index_id: str, question: str, question_embedding: Optional[List[float]] = None) -> List[dict]:
+    """
+    Retrieves chunks for a question: dense + keyword hybrid (using local
+    embeddings). question_embedding, a local embedding of the question, is
+    reused instead of embedding it again.
+    """
+    from vector_store import retrieve_hybrid_chunks_async, EmbeddingModelMismatch
+
     try:
-        relevant_chunks = retrieve_relevant_chunks(video_id, question, top_k=5, use_openai_embeddings=False)
+        chunks, timings = await retrieve_hybrid_chunks_async(
+            index_id, question, top_k=QA_TOP_K, use_openai_embeddings=False, query_embedding=question_embedding
+        )
+        print(f"DEBUG: Retrieval for {index_id} took {timings} ms")
+        return chunks
+    except EmbeddingModelMismatch as e:
+        print(f"Retrieval error: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail="This video was indexed with a different embedding model. Please re-summarize it first."
+        )
     except Exception as e:
         print(f"Retrieval error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve relevant content")
-    
-    if not relevant_chunks:
-        return {
-            "answer": "I couldn't find relevant information in the video transcript to answer this question.",
-            "sources": []
-        }
-    
+
+def build_qa_messages(question: str, relevant_chunks: List[dict]) -> List[dict]:
     # Build context from chunks
     context_parts = []
     for i, chunk in enumerate(relevant_chunks):
         context_parts.append(f"[Source {i+1}]\n{chunk['text']}")
     
     context = "\n\n".join(context_parts)
-    
-    # Source-grounded system prompt
-    system_prompt = """You are a source-grounded research assistant analyzing video transcripts.
-
-CRITICAL RULES:
-1. Only use information from the provided transcript sources
-2. Do NOT add outside knowledge or assumptions
-3. If something is not in the sources, say: "Not mentioned in the provided transcript"
-4. Reference sources as [Source 1], [Source 2], etc.
-5. Be precise and information-dense
-6. Remove filler words from quotes
-
-Never hallucinate. Never invent details. Stay grounded in the transcript."""
 
     user_prompt = f"""Based on the following transcript excerpts, answer this question:
 
@@ -390,39 +465,327 @@ Transcript Sources:
 
 Provide a clear, concise answer using only the information above. Reference your sources."""
 
+    return [
+        {"role": "system", "content": QA_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def format_sources(relevant_chunks: List[dict]) -> List[dict]:
+    return [
+        {
+            "source_id": i + 1,
+            "text": chunk['text'][:200] + "..." if len(chunk['text']) > 200 else chunk['text'],
+            # Convert distance to similarity; keyword-only hits have no distance
+            "relevance": 1 - chunk['distance'] if chunk.get('distance') is not None else None,
+            "start_time": chunk.get('metadata', {}).get('start_time')
+        }
+        for i, chunk in enumerate(relevant_chunks)
+    ]
+
+# --- Endpoints ---
+
+@router.post("/upload")
+async def upload_video(
+    file: UploadFile = File(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if not file.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    
+    file_id = str(uuid.uuid4())
+    file_ext = os.path.splitext(file.filename)[1]
+    file_path = f"{UPLOAD_DIR}/{file_id}{file_ext}"
+    
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    
+    db = await get_database()
+    video_doc = {
+        "user_id": current_user.id,
+        "title": file.filename,
+        "file_path": file_path,
+        "status": "uploaded",
+        "created_at": datetime.utcnow()
+    }
+    
+    result = await db.videos.insert_one(video_doc)
+    return {
+        "id": str(result.inserted_id),
+        "filename": file.filename,
+        "status": "uploaded"
+    }
+
+VIDEO_LIST_PROJECTION = {
+    "title": 1, "type": 1, "status": 1, "summary_type": 1, "url": 1,
+    "youtube_id": 1, "created_at": 1, "summary_preview": preview("summary")
+}
+
+@router.get("/")
+async def get_user_videos(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Newest-first video history. fields=summary returns titles, timestamps
+    and a short summary preview; fetch GET /{video_id} for the full body.
+    The next page's cursor is returned in the X-Next-Cursor header.
+    """
+    db = await get_database()
+    videos, next_cursor = await paginate(
+        db.videos, {"user_id": current_user.id}, "created_at", -1, limit, cursor,
+        VIDEO_LIST_PROJECTION if fields == "summary" else None
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return videos
+
+@router.get("/{video_id}")
+async def get_video(video_id: str, current_user: UserResponse = Depends(get_current_user)):
+    db = await get_database()
+    video, _ = await find_user_video(db, video_id, current_user.id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    video["_id"] = str(video["_id"])
+    return video
+
+@router.post("/youtube")
+async def summarize_youtube(
+    url: str = Form(...),
+    summary_type: str = Form("detailed"),
+    background: bool = Form(False),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Summarizes a YouTube video. With background=true the work is queued as
+    a job and the response is {job_id}; poll GET /api/jobs/{job_id}.
+    """
+    if background:
+        if not extract_video_id(url):
+            raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+        job_id = await submit_job(current_user.id, "youtube_summary", {
+            "user_id": current_user.id,
+            "url": url,
+            "summary_type": summary_type
+        })
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+    return await run_youtube_summary(current_user.id, url, summary_type)
+
+@router.post("/youtube/stream")
+async def summarize_youtube_stream(
+    url: str = Form(...),
+    summary_type: str = Form("detailed"),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of /youtube. Emits 'status' events while the
+    transcript is fetched and indexed, a 'token' event per summary delta,
+    and 'done' with the saved video document, or 'error'.
+    """
+    video_id = extract_video_id(url)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+    if not async_client:
+        raise HTTPException(status_code=500, detail="AI Summarization is currently unavailable (Client not initialized).")
+
+    async def events():
+        from vector_store import get_video_chunk_count
+
+        summary = await get_cached_summary(video_id, summary_type, SUMMARY_MODEL)
+        if summary is not None:
+            if await asyncio.to_thread(get_video_chunk_count, video_id) == 0:
+                yield sse_event("status", {"stage": "indexing"})
+                try:
+                    await index_youtube_transcript(video_id, url)
+                except HTTPException as e:
+                    yield sse_event("error", {"detail": e.detail})
+                    return
+            yield sse_event("token", {"content": summary})
+        else:
+            yield sse_event("status", {"stage": "transcript"})
+            try:
+                transcript, _ = await index_youtube_transcript(video_id, url)
+            except HTTPException as e:
+                yield sse_event("error", {"detail": e.detail})
+                return
+
+            yield sse_event("status", {"stage": "summarizing"})
+            context_text = await build_summary_context(video_id, transcript)
+            parts = []
+            try:
+                async for delta in stream_completion(build_summary_messages(context_text, summary_type), model=SUMMARY_MODEL):
+                    parts.append(delta)
+                    yield sse_event("token", {"content": delta})
+            except Exception as e:
+                print(f"Summary Stream Error: {e}")
+                yield sse_event("error", {"detail": f"Error generating {summary_type} summary."})
+                return
+
+            summary = "".join(parts).strip()
+            if not summary:
+                # Caching or saving it would serve an empty summary until the TTL expires
+                yield sse_event("error", {"detail": f"Error generating {summary_type} summary."})
+                return
+            try:
+                await set_cached_summary(video_id, summary_type, SUMMARY_MODEL, summary)
+            except Exception as e:
+                print(f"WARNING: Failed to cache summary for {video_id}: {e}")
+
+        video_doc = await save_youtube_summary(current_user.id, video_id, url, summary, summary_type)
+        yield sse_event("done", video_doc)
+
+    return sse_response(events())
+
+@router.delete("/youtube/{youtube_id}/summary-cache")
+async def invalidate_youtube_summary(
+    youtube_id: str,
+    summary_type: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Drops cached summaries so the next request regenerates them. Without a
+    summary_type the stored partial summaries are dropped as well.
+    """
+    deleted = await invalidate_summaries(youtube_id, summary_type)
+    if not summary_type:
+        await delete_partial_summaries(youtube_id)
+    return {"status": "success", "deleted_count": deleted}
+
+@router.post("/{video_id}/summarize")
+async def summarize_local_video(
+    video_id: str,
+    summary_type: str = Form("detailed"),
+    background: bool = Form(False),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    if not background:
+        return await run_local_video_summary(current_user.id, video_id, summary_type)
+
+    db = await get_database()
+    video, _ = await find_user_video(db, video_id, current_user.id)
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    job_id = await submit_job(current_user.id, "local_video_summary", {
+        "user_id": current_user.id,
+        "video_id": video_id,
+        "summary_type": summary_type
+    })
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+@router.post("/{video_id}/ask")
+async def ask_video_question(
+    video_id: str,
+    question: str = Form(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Ask a question about a video's content using RAG retrieval.
+    Returns source-grounded answers based on transcript chunks. A close
+    enough earlier question about the same video is answered from the
+    answer cache ("cached": true).
+    """
+    index_id, content_hash = await resolve_question_index(video_id, current_user)
+    question_embedding = await embed_question(question)
+    cached = await get_cached_answer(index_id, content_hash, question_embedding)
+    if cached:
+        return {"answer": cached["answer"], "sources": cached["sources"], "video_id": video_id, "cached": True}
+
+    relevant_chunks = await retrieve_question_chunks(index_id, question, question_embedding)
+    
+    if not relevant_chunks:
+        return {
+            "answer": NO_RELEVANT_CHUNKS_ANSWER,
+            "sources": []
+        }
+
     # Get answer from DeepSeek
-    if not client:
+    if not async_client:
         raise HTTPException(status_code=500, detail="AI service unavailable")
     
     try:
-        response = client.chat.completions.create(
+        started = time.perf_counter()
+        response = await async_client.chat.completions.create(
             model="deepseek/deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=client.default_max_tokens
+            messages=build_qa_messages(question, relevant_chunks),
+            max_tokens=async_client.default_max_tokens
         )
+        llm_ms = (time.perf_counter() - started) * 1000
         
         answer = response.choices[0].message.content.strip()
         
-        # Format sources for response
-        sources = [
-            {
-                "source_id": i + 1,
-                "text": chunk['text'][:200] + "..." if len(chunk['text']) > 200 else chunk['text'],
-                "relevance": 1 - chunk.get('distance', 0)  # Convert distance to similarity
-            }
-            for i, chunk in enumerate(relevant_chunks)
-        ]
-        
-        return {
-            "answer": answer,
-            "sources": sources,
-            "video_id": video_id
-        }
-        
     except Exception as e:
         print(f"AI Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate answer")
 
+    sources = format_sources(relevant_chunks)
+    try:
+        await set_cached_answer(index_id, content_hash, question_embedding, question, answer, sources, llm_ms)
+    except Exception as e:
+        print(f"Answer cache store failed: {e}")
+
+    return {
+        "answer": answer,
+        "sources": sources,
+        "video_id": video_id,
+        "cached": False
+    }
+
+@router.post("/{video_id}/ask/stream")
+async def ask_video_question_stream(
+    video_id: str,
+    question: str = Form(...),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Streaming variant of /ask. Emits 'sources' first, then a 'token' event
+    per delta and a final 'done' ({"answer", "video_id", "cached"}), or
+    'error'. A cached answer arrives as a single 'token' event.
+    """
+    index_id, content_hash = await resolve_question_index(video_id, current_user)
+    question_embedding = await embed_question(question)
+    cached = await get_cached_answer(index_id, content_hash, question_embedding)
+    if cached:
+        async def cached_events():
+            yield sse_event("sources", {"sources": cached["sources"]})
+            yield sse_event("token", {"content": cached["answer"]})
+            yield sse_event("done", {"answer": cached["answer"], "video_id": video_id, "cached": True})
+        return sse_response(cached_events())
+
+    relevant_chunks = await retrieve_question_chunks(index_id, question, question_embedding)
+    if relevant_chunks and not async_client:
+        raise HTTPException(status_code=500, detail="AI service unavailable")
+
+    async def events():
+        if not relevant_chunks:
+            yield sse_event("sources", {"sources": []})
+            yield sse_event("done", {"answer": NO_RELEVANT_CHUNKS_ANSWER, "video_id": video_id})
+            return
+
+        sources = format_sources(relevant_chunks)
+        yield sse_event("sources", {"sources": sources})
+        parts = []
+        started = time.perf_counter()
+        try:
+            async for delta in stream_completion(build_qa_messages(question, relevant_chunks)):
+                parts.append(delta)
+                yield sse_event("token", {"content": delta})
+        except Exception as e:
+            print(f"AI Stream Error: {e}")
+            yield sse_event("error", {"detail": "Failed to generate answer"})
+            return
+        answer = "".join(parts).strip()
+        yield sse_event("done", {"answer": answer, "video_id": video_id, "cached": False})
+        if not answer:
+            return
+        try:
+            await set_cached_answer(
+                index_id, content_hash, question_embedding, question, answer, sources,
+                (time.perf_counter() - started) * 1000
+            )
+        except Exception as e:
+            print(f"Answer cache store failed: {e}")
+
+    return sse_response(events())
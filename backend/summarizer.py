@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from ai_client import async_client
+from database import get_database
+from summary_cache import SUMMARY_CACHE_TTL_HOURS
+from utils.embedding_utils import count_tokens, iter_transcript_chunks
+
+# Map-reduce settings. Transcripts longer than one map chunk are summarized
+# part by part, then the partial summaries are reduced per summary type.
+SUMMARY_MAP_CHUNK_TOKENS = int(os.getenv("SUMMARY_MAP_CHUNK_TOKENS", 3000))
+SUMMARY_MAP_MAX_TOKENS = int(os.getenv("SUMMARY_MAP_MAX_TOKENS", 400))
+# Concurrent map calls per worker, shared by every request
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+# Partial summaries are collapsed again until they fit this reduce budget
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", 12000))
+
+MAP_PROMPT = (
+    "You summarize one part of a longer lecture transcript. Keep every key "
+    "concept, definition, example, formula and conclusion from this part. "
+    "Be dense and factual; do not add an introduction or refer to 'this part'."
+)
+
+_map_slots = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+_stats = {"parts_generated": 0, "parts_reused": 0, "collapses": 0, "single_pass": 0}
+
+def _clock(seconds: Optional[float]) -> str:
+    seconds = int(seconds or 0)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+def _part_label(index: int, part: Dict) -> str:
+    if part.get("start_time") is None:
+        return f"[Part {index + 1}]"
+    return f"[Part {index + 1}, {_clock(part['start_time'])}-{_clock(part['end_time'])}]"
+
+def _part_id(video_id: str, model: str, text: str) -> str:
+    # Keyed by content so a re-fetched transcript with other text never reuses stale parts
+    digest = hashlib.sha1(f"{model}\n{text}".encode()).hexdigest()[:20]
+    return f"{video_id}:{digest}"
+
+async def _summarize_text(text: str, model: str) -> str:
+    async with _map_slots:
+        response = await async_client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": MAP_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            max_tokens=SUMMARY_MAP_MAX_TOKENS
+        )
+    return response.choices[0].message.content.strip()
+
+async def summarize_parts(video_id: str, chunks: List[Dict], model: str) -> List[Dict]:
+    """
+    Summarizes each chunk, reusing stored partial summaries. Missing parts
+    are generated concurrently under the shared map limit and stored so
+    every summary type of the same video reuses them.
+    """
+    db = await get_database()
+    ids = [_part_id(video_id, model, chunk["text"]) for chunk in chunks]
+    stored = {
+        doc["_id"]: doc["summary"]
+        async for doc in db.chunk_summaries.find({"_id": {"$in": ids}}, {"summary": 1})
+    }
+    _stats["parts_reused"] += len(stored)
+
+    async def summarize(part_id: str, chunk: Dict) -> str:
+        summary = await _summarize_text(chunk["text"], model)
+        now = datetime.utcnow()
+        await db.chunk_summaries.replace_one(
+            {"_id": part_id},
+            {
+                "video_id": video_id,
+                "model": model,
+                "summary": summary,
+                "start_time": chunk.get("start_time"),
+                "end_time": chunk.get("end_time"),
+                "created_at": now,
+                "expires_at": now + timedelta(hours=SUMMARY_CACHE_TTL_HOURS),
+            },
+            upsert=True
+        )
+        _stats["parts_generated"] += 1
+        return summary
+
+    missing = [(part_id, chunk) for part_id, chunk in zip(ids, chunks) if part_id not in stored]
+    if missing:
+        print(f"DEBUG: Summarizing {len(missing)}/{len(chunks)} transcript parts for {video_id}")
+        generated = await asyncio.gather(*(summarize(part_id, chunk) for part_id, chunk in missing))
+        stored.update(zip((part_id for part_id, _ in missing), generated))
+
+    return [
+        {"summary": stored[part_id], "start_time": chunk.get("start_time"), "end_time": chunk.get("end_time")}
+        for part_id, chunk in zip(ids, chunks)
+    ]
+
+async def _collapse(sections: List[str], model: str) -> List[str]:
+    """Merges neighbouring sections into groups under the reduce budget and summarizes each group."""
+    groups, current, used = [], [], 0
+    for section in sections:
+        tokens = count_tokens(section)
+        if current and used + tokens > SUMMARY_REDUCE_TOKENS // 2:
+            groups.append(current)
+            current, used = [], 0
+        current.append(section)
+        used += tokens
+    groups.append(current)
+    _stats["collapses"] += 1
+    return list(await asyncio.gather(*(_summarize_text("\n\n".join(group), model) for group in groups)))
+
+async def build_map_reduce_context(video_id: str, transcript: Dict, model: str) -> str:
+    """
+    Returns the text the final summary prompt is built from: the transcript
+    itself when it fits one map chunk, otherwise its labelled partial
+    summaries, collapsed further if they exceed SUMMARY_REDUCE_TOKENS.
+    """
+    source = transcript.get("segments") or transcript["text"]
+    chunks = list(iter_transcript_chunks(source, max_tokens=SUMMARY_MAP_CHUNK_TOKENS, overlap=0))
+    if len(chunks) <= 1:
+        _stats["single_pass"] += 1
+        return transcript["text"]
+
+    parts = await summarize_parts(video_id, chunks, model)
+    sections = [f"{_part_label(i, part)}\n{part['summary']}" for i, part in enumerate(parts)]
+    while len(sections) > 1 and sum(count_tokens(s) for s in sections) > SUMMARY_REDUCE_TOKENS:
+        sections = await _collapse(sections, model)
+    return "\n\n".join(sections)
+
+async def delete_partial_summaries(video_id: str) -> int:
+    db = await get_database()
+    result = await db.chunk_summaries.delete_many({"video_id": video_id})
+    return result.deleted_count
+
+def get_summarizer_stats() -> Dict:
+    return {**_stats, "map_concurrency": SUMMARY_MAP_CONCURRENCY}
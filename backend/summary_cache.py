@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from database import get_database
+
+# Configuration
+SUMMARY_CACHE_TTL_HOURS = float(os.getenv("SUMMARY_CACHE_TTL_HOURS", 24 * 7))
+
+# Per-worker counters; the per-document 'hits' field gives the global view
+_stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+def _cache_key(video_id: str, summary_type: str, model: str) -> str:
+    return f"{video_id}:{summary_type}:{model}"
+
+async def get_cached_summary(video_id: str, summary_type: str, model: str) -> Optional[str]:
+    """Returns a still-valid cached summary or None."""
+    db = await get_database()
+    now = datetime.utcnow()
+    doc = await db.summary_cache.find_one_and_update(
+        {"_id": _cache_key(video_id, summary_type, model), "expires_at": {"$gt": now}},
+        {"$inc": {"hits": 1}, "$set": {"last_hit": now}},
+        projection={"summary": 1}
+    )
+    if doc is None:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return doc["summary"]
+
+async def set_cached_summary(video_id: str, summary_type: str, model: str, summary: str):
+    db = await get_database()
+    now = datetime.utcnow()
+    await db.summary_cache.replace_one(
+        {"_id": _cache_key(video_id, summary_type, model)},
+        {
+            "video_id": video_id,
+            "summary_type": summary_type,
+            "model": model,
+            "summary": summary,
+            "hits": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(hours=SUMMARY_CACHE_TTL_HOURS),
+        },
+        upsert=True
+    )
+    _stats["stores"] += 1
+
+async def invalidate_summaries(video_id: str, summary_type: Optional[str] = None) -> int:
+    """Drops cached summaries for a video (optionally a single summary_type)."""
+    db = await get_database()
+    query = {"video_id": video_id}
+    if summary_type:
+        query["summary_type"] = summary_type
+    result = await db.summary_cache.delete_many(query)
+    _stats["invalidations"] += result.deleted_count
+    return result.deleted_count
+
+def get_summary_cache_stats() -> Dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0,
+        "ttl_hours": SUMMARY_CACHE_TTL_HOURS,
+    }
@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from database import get_database
+
+# Preference order when several transcripts are cached for the same video.
+# Lower is better: human captions beat auto-generated ones, which beat our own ASR.
+SOURCE_RANK = {
+    "official": 0,
+    "manual": 1,
+    "generated": 2,
+    "first_available": 3,
+    "asr": 4,
+}
+
+async def get_cached_transcript(video_id: str, language: str = "en") -> Optional[Dict]:
+    """
+    Returns the best cached transcript for a YouTube video, or None.
+
+    Transcripts in the requested language are preferred; within a language
+    the source with the lowest SOURCE_RANK wins.
+    """
+    db = await get_database()
+    docs = await db.transcripts.find({"video_id": video_id}).to_list(20)
+    if not docs:
+        return None
+
+    docs.sort(key=lambda d: (d.get("language") != language, SOURCE_RANK.get(d.get("source"), len(SOURCE_RANK))))
+    best = docs[0]
+    await db.transcripts.update_one(
+        {"_id": best["_id"]},
+        {"$set": {"last_used": datetime.utcnow()}, "$inc": {"hits": 1}}
+    )
+    return best
+
+async def save_transcript(
+    video_id: str,
+    text: str,
+    language: str,
+    source: str,
+    segments: Optional[List[Dict]] = None
+):
+    """Upserts a transcript keyed by (video_id, language, source)."""
+    db = await get_database()
+    now = datetime.utcnow()
+    await db.transcripts.update_one(
+        {"video_id": video_id, "language": language, "source": source},
+        {
+            "$set": {
+                "text": text,
+                "segments": segments or [],
+                "updated_at": now,
+                "last_used": now,
+            },
+            "$setOnInsert": {"created_at": now, "hits": 0},
+        },
+        upsert=True
+    )
+
+async def delete_cached_transcripts(video_id: str) -> int:
+    """Removes every cached transcript for a video (e.g. after a caption update)."""
+    db = await get_database()
+    result = await db.transcripts.delete_many({"video_id": video_id})
+    return result.deleted_count
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from utils.embedding_utils import generate_embeddings
+
+# Configuration
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 64))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5))
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into a single model call.
+
+    Callers await `embed(texts)`. A background task collects requests until
+    either `max_batch_size` texts are queued or `max_wait_ms` has passed
+    since the first one arrived, runs one batched `generate_embeddings` in a
+    worker thread, and hands each caller back its own slice of the result.
+    """
+
+    def __init__(self, use_openai: bool, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS):
+        self.use_openai = use_openai
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Stats
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.max_batch_seen = 0
+        self.total_encode_time = 0.0
+        self.total_wait_time = 0.0
+        self.errors = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            pending = [first]
+            size = len(first[0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            await self._flush(pending)
+
+    async def _flush(self, pending: List[Tuple[List[str], asyncio.Future, float]]):
+        all_texts = [text for texts, _, _ in pending for text in texts]
+        started = time.perf_counter()
+        try:
+            embeddings = await asyncio.to_thread(generate_embeddings, all_texts, self.use_openai)
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        self.batches += 1
+        self.requests += len(pending)
+        self.texts += len(all_texts)
+        self.max_batch_seen = max(self.max_batch_seen, len(all_texts))
+        self.total_encode_time += finished - started
+
+        offset = 0
+        for texts, future, enqueued in pending:
+            self.total_wait_time += started - enqueued
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "openai" if self.use_openai else "local",
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0,
+            "max_batch_seen": self.max_batch_seen,
+            "avg_encode_ms": round(self.total_encode_time / self.batches * 1000, 2) if self.batches else 0,
+            "avg_queue_wait_ms": round(self.total_wait_time / self.requests * 1000, 2) if self.requests else 0,
+            "errors": self.errors,
+        }
+
+_batchers: Dict[bool, EmbeddingBatcher] = {}
+
+def get_batcher(use_openai: bool = True) -> EmbeddingBatcher:
+    if use_openai not in _batchers:
+        _batchers[use_openai] = EmbeddingBatcher(use_openai)
+    return _batchers[use_openai]
+
+async def embed_texts(texts: List[str], use_openai: bool = True) -> List[List[float]]:
+    """Async, batched counterpart of generate_embeddings()."""
+    return await get_batcher(use_openai).embed(texts)
+
+def get_batcher_stats() -> List[Dict]:
+    return [batcher.stats() for batcher in _batchers.values()]
@@ -0,0 +1,105 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Configuration
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Leave unset to let sentence-transformers pick cuda/mps/cpu on its own
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+# Cross-encoder used to re-rank retrieval candidates; leave unset to disable
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "")
+
+# Loaded SentenceTransformer instances keyed by (model_name, device)
+_models: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+def _model_key(model_name: str, device: Optional[str]) -> Tuple[str, str]:
+    return (model_name, device or "auto")
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME, device: Optional[str] = EMBEDDING_DEVICE):
+    """
+    Returns a process-wide SentenceTransformer for (model_name, device),
+    loading the weights from disk only the first time it is requested.
+    """
+    key = _model_key(model_name, device)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                print(f"DEBUG: Loading embedding model {model_name} (device={key[1]})")
+                model = SentenceTransformer(model_name, device=device)
+                _models[key] = model
+    return model
+
+def is_model_loaded(model_name: str = EMBEDDING_MODEL_NAME, device: Optional[str] = EMBEDDING_DEVICE) -> bool:
+    return _model_key(model_name, device) in _models
+
+def encode_local(
+    texts: List[str],
+    model_name: str = EMBEDDING_MODEL_NAME,
+    device: Optional[str] = EMBEDDING_DEVICE,
+    batch_size: int = EMBEDDING_BATCH_SIZE
+) -> List[List[float]]:
+    """Embed texts with a cached local sentence-transformers model."""
+    if not texts:
+        return []
+    model = get_embedding_model(model_name, device)
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return embeddings.tolist()
+
+def embedding_model_name(use_openai: bool) -> str:
+    """Identifies the model behind an embedding path, e.g. for index manifests."""
+    return f"openai:{OPENAI_EMBEDDING_MODEL}" if use_openai else f"local:{EMBEDDING_MODEL_NAME}"
+
+def get_reranker(model_name: str = RERANK_MODEL_NAME, device: Optional[str] = EMBEDDING_DEVICE):
+    """Process-wide CrossEncoder, shared through the same registry as the embedders."""
+    key = _model_key(f"cross-encoder:{model_name}", device)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                from sentence_transformers import CrossEncoder
+                print(f"DEBUG: Loading re-rank model {model_name} (device={key[1]})")
+                model = CrossEncoder(model_name, device=device)
+                _models[key] = model
+    return model
+
+def rerank_scores(query: str, texts: List[str], model_name: str = RERANK_MODEL_NAME) -> List[float]:
+    """Cross-encoder relevance of each text to the query (higher is better)."""
+    if not texts:
+        return []
+    scores = get_reranker(model_name).predict([(query, text) for text in texts], batch_size=EMBEDDING_BATCH_SIZE)
+    return [float(score) for score in scores]
+
+def encode_openai(texts: List[str], model: str = OPENAI_EMBEDDING_MODEL) -> List[List[float]]:
+    """Embed texts with OpenAI, reusing the shared client from ai_client."""
+    from ai_client import openai_client
+    if openai_client is None:
+        raise ValueError("OPENAI_API_KEY not set. Cannot generate embeddings.")
+    if not texts:
+        return []
+
+    # OpenAI allows batch embedding
+    response = openai_client.embeddings.create(
+        model=model,
+        input=texts
+    )
+    return [item.embedding for item in response.data]
+
+def warm_up(model_name: str = EMBEDDING_MODEL_NAME, device: Optional[str] = EMBEDDING_DEVICE) -> bool:
+    """
+    Loads the local model and runs one tiny forward pass so the first real
+    request does not pay for weight loading or lazy kernel initialization.
+    """
+    try:
+        encode_local(["warm up"], model_name=model_name, device=device, batch_size=1)
+        print(f"DEBUG: Embedding model {model_name} warmed up")
+        return True
+    except Exception as e:
+        print(f"Embedding warm-up failed: {e}")
+        return False
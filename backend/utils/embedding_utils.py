@@ -1,15 +1,26 @@
+import re
+import sqlite3
 import tiktoken
-from typing import List, Tuple
-import os
-from openai import OpenAI
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple, Union
+from utils.embedding_service import encode_local, encode_openai, embedding_model_name
+from utils.embedding_cache import get_embedding_cache
 
-def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
-    """Count the number of tokens in a text string."""
+# Sentence boundaries for plain-text transcripts and for snapping chunk edges
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-3.5-turbo"):
+    """Resolves the tiktoken encoding for a model once per process."""
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
-        encoding = tiktoken.get_encoding("cl100k_base")
-    return len(encoding.encode(text))
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count the number of tokens in a text string."""
+    return len(get_encoding(model).encode(text))
 
 def chunk_text(text: str, max_tokens: int = 1000, overlap: int = 100) -> List[dict]:
     """
@@ -17,7 +28,7 @@ def chunk_text(text: str, max_tokens: int = 1000, overlap: int = 100) -> List[di
     Returns list of dicts with 'text', 'start_idx', 'end_idx', 'token_count'.
     """
     try:
-        encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = get_encoding()
     except:
         # Fallback: simple character-based chunking
         return chunk_text_simple(text, max_tokens * 4, overlap * 4)
@@ -46,15 +57,124 @@ def chunk_text(text: str, max_tokens: int = 1000, overlap: int = 100) -> List[di
         
         chunk_id += 1
         
+        # Prevent infinite loop: the last window has been emitted
+        if end >= len(tokens):
+            break
+        
         # Move start forward, accounting for overlap
         start = end - overlap
-        
-        # Prevent infinite loop
-        if start >= len(tokens):
-            break
     
     return chunks
 
+def _transcript_units(source: Union[str, Iterable[dict]]) -> Iterator[dict]:
+    """
+    Yields the smallest pieces a chunk boundary may fall between: sentences
+    of a plain-text transcript, or timed caption segments.
+    """
+    if isinstance(source, str):
+        start = 0
+        for match in _SENTENCE_SPLIT.finditer(source):
+            yield {"text": source[start:match.start()], "start": None, "end": None}
+            start = match.end()
+        yield {"text": source[start:], "start": None, "end": None}
+        return
+
+    for segment in source:
+        start = segment.get("start", 0)
+        yield {"text": segment["text"], "start": start, "end": start + segment.get("duration", 0)}
+
+def _sized_units(units: Iterator[dict], limit: int) -> Iterator[dict]:
+    """Attaches token counts, splitting any unit longer than limit tokens."""
+    try:
+        encoding = get_encoding()
+        encode, decode = encoding.encode, encoding.decode
+    except Exception:
+        # Tokenizer unavailable (e.g. offline): treat words as tokens
+        encode, decode = str.split, " ".join
+
+    for unit in units:
+        text = " ".join(unit["text"].split())
+        if not text:
+            continue
+        tokens = encode(text)
+        pieces = [(text, len(tokens))] if len(tokens) <= limit else [
+            (decode(tokens[i:i + limit]), len(tokens[i:i + limit]))
+            for i in range(0, len(tokens), limit)
+        ]
+        for piece, count in pieces:
+            yield {
+                **unit,
+                "text": piece,
+                "tokens": count,
+                "sentence_end": bool(_SENTENCE_END.search(piece)),
+            }
+
+def _make_chunk(chunk_id: int, units: List[dict]) -> dict:
+    chunk = {
+        'id': chunk_id,
+        'text': " ".join(u["text"] for u in units),
+        'start_token': units[0]["offset"],
+        'end_token': units[-1]["offset"] + units[-1]["tokens"],
+        'token_count': sum(u["tokens"] for u in units),
+    }
+    if units[0]["start"] is not None:
+        chunk['start_time'] = round(units[0]["start"], 2)
+        chunk['end_time'] = round(units[-1]["end"], 2)
+    return chunk
+
+def iter_transcript_chunks(
+    source: Union[str, Iterable[dict]],
+    max_tokens: int = 1000,
+    overlap: int = 100
+) -> Iterator[dict]:
+    """
+    Lazily splits a transcript into chunks of at most max_tokens.
+
+    source is either plain text or caption segments ({'text', 'start',
+    'duration'}). Boundaries fall between sentences or segments, preferring
+    the last sentence end past half the budget, and consecutive chunks share
+    up to overlap tokens of whole units. Chunks carry the same keys as
+    chunk_text() plus 'start_time'/'end_time' (seconds) for segments.
+    """
+    # Oversized units are split so a carried overlap plus one unit always fits
+    units = _sized_units(_transcript_units(source), max(1, max_tokens - overlap))
+    buffer: List[dict] = []
+    buffered = 0
+    fresh = 0  # buffer[:fresh] was already emitted as overlap
+    offset = 0
+    chunk_id = 0
+
+    for unit in units:
+        unit["offset"] = offset
+        offset += unit["tokens"]
+
+        while len(buffer) > fresh and buffered + unit["tokens"] > max_tokens:
+            # Snap to the last sentence end past half the budget, else emit all
+            cut, running = len(buffer), 0
+            for i, u in enumerate(buffer):
+                running += u["tokens"]
+                if i >= fresh and u["sentence_end"] and running >= max_tokens // 2:
+                    cut = i + 1
+            emitted, rest = buffer[:cut], buffer[cut:]
+            yield _make_chunk(chunk_id, emitted)
+            chunk_id += 1
+
+            carry, carried = [], 0
+            for u in reversed(emitted):
+                if carried + u["tokens"] > overlap:
+                    break
+                carry.insert(0, u)
+                carried += u["tokens"]
+            buffer = carry + rest
+            buffered = sum(u["tokens"] for u in buffer)
+            fresh = len(carry)
+
+        buffer.append(unit)
+        buffered += unit["tokens"]
+
+    if len(buffer) > fresh:
+        yield _make_chunk(chunk_id, buffer)
+
 def chunk_text_simple(text: str, max_chars: int = 4000, overlap: int = 400) -> List[dict]:
     """Fallback simple character-based chunking."""
     chunks = []
@@ -74,10 +194,9 @@ def chunk_text_simple(text: str, max_chars: int = 4000, overlap: int = 400) -> L
         })
         
         chunk_id += 1
-        start = end - overlap
-        
-        if start >= len(text):
+        if end >= len(text):
             break
+        start = end - overlap
     
     return chunks
 
@@ -91,34 +210,37 @@ def generate_embeddings(texts: List[str], use_openai: bool = True) -> List[List[
     
     Returns:
         List of embedding vectors
+
+    Vectors are looked up in the persistent embedding cache first; only the
+    distinct texts that miss are sent to the model, then cached.
     """
-    if use_openai:
-        return generate_openai_embeddings(texts)
-    else:
-        return generate_local_embeddings(texts)
+    encode = generate_openai_embeddings if use_openai else generate_local_embeddings
+    cache = get_embedding_cache()
+    if cache is None or not texts:
+        return encode(texts)
+
+    model = embedding_model_name(use_openai)
+    try:
+        embeddings = cache.get_many(model, texts)
+    except sqlite3.Error as e:
+        print(f"Embedding cache lookup failed: {e}")
+        embeddings = [None] * len(texts)
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, embeddings) if vector is None))
+    if missing:
+        fresh = dict(zip(missing, encode(missing)))
+        try:
+            cache.put_many(model, missing, [fresh[text] for text in missing])
+        except sqlite3.Error as e:
+            # The embeddings are still good; they just aren't cached this time
+            print(f"Embedding cache store failed: {e}")
+        embeddings = [vector if vector is not None else fresh[text] for text, vector in zip(texts, embeddings)]
+    return embeddings
 
 def generate_openai_embeddings(texts: List[str]) -> List[List[float]]:
     """Generate embeddings using OpenAI's text-embedding-3-small model."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not set. Cannot generate embeddings.")
-    
-    client = OpenAI(api_key=api_key)
-    
-    # OpenAI allows batch embedding
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texts
-    )
-    
-    return [item.embedding for item in response.data]
+    return encode_openai(texts)
 
 def generate_local_embeddings(texts: List[str]) -> List[List[float]]:
     """Generate embeddings using sentence-transformers (local, free)."""
-    from sentence_transformers import SentenceTransformer
-    
-    # Use a lightweight model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(texts, convert_to_numpy=True)
-    
-    return embeddings.tolist()
+    # The model is loaded once per process and reused across calls
+    return encode_local(texts)
@@ -0,0 +1,58 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Keeps identifiers (snake_case, dotted.names) and numbers whole so exact
+# terms from formulas and code match
+_TOKEN = re.compile(r"[a-z0-9_]+(?:\.[a-z0-9_]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it its of on or "
+    "so that the their there these this to was we what when where which who why "
+    "will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over one video's chunks. Built in memory from
+    the documents already stored in the vector collection.
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for doc_index, document in enumerate(documents):
+            terms = tokenize(document)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings[term].append((doc_index, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+
+    def search(self, query: str, top_k: int = 20) -> List[Tuple[str, float]]:
+        """Returns up to top_k (chunk_id, score) pairs, best first."""
+        n = len(self.ids)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_index, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_index] / (self.avg_length or 1))
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.ids[doc_index], score) for doc_index, score in best]
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuses ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] += 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+
+# Header carrying the cursor for the next page. History endpoints keep
+# returning plain JSON arrays, so existing clients are unaffected.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def as_doc_id(item_id: str):
+    """Documents use ObjectId or uuid string ids; match whichever this is."""
+    try:
+        return ObjectId(item_id)
+    except Exception:
+        return item_id
+
+def encode_cursor(doc: Dict, sort_field: str) -> str:
+    value = doc.get(sort_field)
+    doc_id = doc["_id"]
+    payload = {
+        "v": value.isoformat() if isinstance(value, datetime) else value,
+        "d": isinstance(value, datetime),
+        "id": str(doc_id),
+        "oid": isinstance(doc_id, ObjectId),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = datetime.fromisoformat(payload["v"]) if payload["d"] else payload["v"]
+        doc_id = ObjectId(payload["id"]) if payload["oid"] else payload["id"]
+        return value, doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(
+    collection,
+    query: Dict,
+    sort_field: str,
+    direction: int = -1,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Keyset pagination on (sort_field, _id). Returns (items, next_cursor);
+    next_cursor is None on the last page. Item _ids are stringified.
+    """
+    query = dict(query)
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        op = "$lt" if direction < 0 else "$gt"
+        query["$or"] = [
+            {sort_field: {op: value}},
+            {sort_field: value, "_id": {op: doc_id}},
+        ]
+
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, direction), ("_id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return docs, next_cursor
+
+def preview(field: str, length: int = 200) -> Dict:
+    """Projection expression returning the first `length` characters of a text field."""
+    return {"$substrCP": [{"$ifNull": [f"${field}", ""]}, 0, length]}
@@ -0,0 +1,39 @@
+import json
+from typing import AsyncIterator, List, Dict
+from fastapi.responses import StreamingResponse
+from ai_client import async_client
+
+# Disable proxy buffering so tokens reach the browser as they are produced
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def sse_event(event: str, data) -> str:
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def stream_completion(
+    messages: List[Dict],
+    model: str = "deepseek/deepseek-chat",
+    max_tokens: int = None
+) -> AsyncIterator[str]:
+    """Yields content deltas from a streaming chat completion."""
+    if not async_client:
+        raise RuntimeError("AI service unavailable")
+
+    stream = await async_client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens or async_client.default_max_tokens,
+        stream=True
+    )
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
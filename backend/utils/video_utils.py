@@ -1,9 +1,10 @@
 import os
+import asyncio
 import cv2
 import yt_dlp
 from moviepy import VideoFileClip
 import speech_recognition as sr
-from ai_client import client
+from ai_client import async_client
 
 def download_youtube_audio(video_url, output_path_base):
     """
@@ -28,7 +29,13 @@ def download_youtube_audio(video_url, output_path_base):
         print(f"YouTube Audio Download Error: {e}")
         return None
 
-def transcribe_audio_with_deepseek(audio_path):
+def _recognize_audio(recognizer, wav_path):
+    """Blocking Google Speech Recognition call; run it off the event loop."""
+    with sr.AudioFile(wav_path) as source:
+        audio_data = recognizer.record(source)
+        return recognizer.recognize_google(audio_data)
+
+async def transcribe_audio_with_deepseek(audio_path):
     """
     Transcribe audio using local speech recognition + DeepSeek for cleanup.
     This is a free alternative to OpenAI Whisper.
@@ -42,24 +49,22 @@ def transcribe_audio_with_deepseek(audio_path):
         
         if not wav_path.endswith('.wav'):
             from pydub import AudioSegment
-            audio = AudioSegment.from_file(audio_path)
-            audio.export(wav_path, format='wav')
+            audio = await asyncio.to_thread(AudioSegment.from_file, audio_path)
+            await asyncio.to_thread(audio.export, wav_path, format='wav')
         
         # Transcribe using Google Speech Recognition (free)
-        with sr.AudioFile(wav_path) as source:
-            audio_data = recognizer.record(source)
-            raw_text = recognizer.recognize_google(audio_data)
+        raw_text = await asyncio.to_thread(_recognize_audio, recognizer, wav_path)
         
         # If we got this far, we have a basic transcription
         # Now use DeepSeek to clean it up and add punctuation
-        if client:
-            response = client.chat.completions.create(
+        if async_client:
+            response = await async_client.chat.completions.create(
                 model="deepseek/deepseek-chat",
                 messages=[
                     {"role": "system", "content": "You are a professional transcription editor. Clean up the following transcription by adding proper punctuation, capitalization, and formatting. Keep the exact words but make it readable."},
                     {"role": "user", "content": raw_text}
                 ],
-                max_tokens=client.default_max_tokens
+                max_tokens=async_client.default_max_tokens
             )
             cleaned_text = response.choices[0].message.content.strip()
             
@@ -96,10 +101,69 @@ def extract_audio(video_path, output_audio_path):
         print(f"Error extracting audio: {e}")
         return False
 
-def extract_frames(video_path, output_folder, interval=10):
+# Below this many frames between samples, sequential grab() is cheaper than
+# seeking, because every seek restarts decoding from the previous keyframe.
+SEEK_MIN_FRAME_GAP = 48
+
+def _save_frame(image, output_folder, index):
+    frame_path = os.path.join(output_folder, f"frame_{index}.jpg")
+    cv2.imwrite(frame_path, image)
+    return frame_path
+
+def _extract_frames_seek(cap, output_folder, frame_interval, frame_count):
+    """
+    Jumps straight to each target frame. Returns None if any seek fails, so
+    the caller re-extracts everything with grab() instead of keeping a
+    partial result.
+    """
+    frame_paths = []
+    for index, target in enumerate(range(0, frame_count, frame_interval)):
+        if not cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+            return None
+        success, image = cap.read()
+        if not success:
+            # Some containers report a frame count past the last decodable frame
+            if index == 0:
+                return None
+            break
+        frame_paths.append(_save_frame(image, output_folder, index))
+    return frame_paths
+
+def _extract_frames_grab(cap, output_folder, frame_interval):
+    """Walks the stream with grab() and only retrieves/converts sampled frames."""
+    frame_paths = []
+    count = 0
+    while cap.grab():
+        if count % frame_interval == 0:
+            success, image = cap.retrieve()
+            if success:
+                frame_paths.append(_save_frame(image, output_folder, count // frame_interval))
+        count += 1
+    return frame_paths
+
+def _extract_frames_decode(cap, output_folder, frame_interval):
+    """Original loop: fully decodes every frame. Kept for benchmarking."""
+    frame_paths = []
+    count = 0
+    success, image = cap.read()
+    while success:
+        if count % frame_interval == 0:
+            frame_paths.append(_save_frame(image, output_folder, count // frame_interval))
+        success, image = cap.read()
+        count += 1
+    return frame_paths
+
+def extract_frames(video_path, output_folder, interval=10, mode="auto"):
     """
     Extracts frames from a video file at a given interval (in seconds).
     Returns a list of paths to the extracted frames.
+
+    mode:
+        "seek"   - seek directly to each sample timestamp
+        "grab"   - grab() every frame, decode only the sampled ones
+        "decode" - read() every frame (legacy behaviour)
+        "auto"   - seek when samples are far apart, falling back to grab
+                   for streams that don't report a length or can't seek
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
@@ -111,22 +175,84 @@ def extract_frames(video_path, output_folder, interval=10):
         if fps <= 0:
             fps = 30 # Fallback
             
-        frame_interval = int(fps * interval)
-        count = 0
-        success, image = cap.read()
-        
-        while success:
-            if count % frame_interval == 0:
-                frame_name = f"frame_{count//frame_interval}.jpg"
-                frame_path = os.path.join(output_folder, frame_name)
-                cv2.imwrite(frame_path, image)
-                frame_paths.append(frame_path)
-            
-            success, image = cap.read()
-            count += 1
+        frame_interval = max(1, int(fps * interval))
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        if mode == "auto":
+            mode = "seek" if frame_interval >= SEEK_MIN_FRAME_GAP else "grab"
+
+        if mode == "seek" and frame_count > 0:
+            frame_paths = _extract_frames_seek(cap, output_folder, frame_interval, frame_count)
+            if frame_paths is None:
+                print(f"DEBUG: Seeking not supported for {video_path}; falling back to grab()")
+                cap.release()
+                cap = cv2.VideoCapture(video_path)
+                mode = "grab"
+        elif mode == "seek":
+            mode = "grab"
+
+        if mode == "grab":
+            frame_paths = _extract_frames_grab(cap, output_folder, frame_interval)
+        elif mode == "decode":
+            frame_paths = _extract_frames_decode(cap, output_folder, frame_interval)
             
         cap.release()
     except Exception as e:
         print(f"Error extracting frames: {e}")
         
-    return frame_paths
+    return frame_paths or []
+
+# Frames are compared as small grayscale thumbnails. A pixel counts as changed
+# when it moves by more than FRAME_PIXEL_DELTA grey levels; two frames show the
+# same slide when less than FRAME_DEDUPE_THRESHOLD of the pixels changed.
+FRAME_THUMB_SIZE = (160, 90)
+FRAME_PIXEL_DELTA = 32
+FRAME_DEDUPE_THRESHOLD = float(os.getenv("FRAME_DEDUPE_THRESHOLD", 0.004))
+
+def frame_signature(image_path):
+    """
+    Downscaled, lightly blurred grayscale thumbnail of a frame. Cheap to
+    compare and insensitive to compression noise, yet a new line of slide
+    text still changes enough pixels to register.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    thumb = cv2.resize(image, FRAME_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(thumb, (3, 3), 0)
+
+def frame_difference(sig_a, sig_b):
+    """Fraction of thumbnail pixels that changed between two signatures."""
+    changed = cv2.absdiff(sig_a, sig_b) > FRAME_PIXEL_DELTA
+    return float(changed.mean())
+
+def dedupe_frames(frame_paths, interval=10, threshold=FRAME_DEDUPE_THRESHOLD):
+    """
+    Collapses runs of visually identical frames (e.g. one slide shown for
+    minutes) into segments. Each frame is compared with the first frame of
+    the current segment, i.e. the one that will be OCR'd.
+
+    Returns a list of {"path", "start", "end", "frames"} where start/end are
+    seconds into the video and frames is how many samples the segment covers.
+    """
+    segments = []
+    current = None
+    for index, frame_path in enumerate(frame_paths):
+        signature = frame_signature(frame_path)
+        if (
+            segments
+            and signature is not None
+            and current is not None
+            and frame_difference(signature, current) < threshold
+        ):
+            segments[-1]["end"] = (index + 1) * interval
+            segments[-1]["frames"] += 1
+            continue
+        segments.append({
+            "path": frame_path,
+            "start": index * interval,
+            "end": (index + 1) * interval,
+            "frames": 1
+        })
+        current = signature
+    return segments
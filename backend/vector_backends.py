@@ -0,0 +1,559 @@
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.ttl_cache import TTLCache
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Storage backends for vector_store, selected with VECTOR_BACKEND:
+#   chroma - the ChromaDB PersistentClient collection (default)
+#   memmap - NumPy vectors in a memory-mapped .npy file per video, searched
+#            exactly, plus an HNSW graph (optional hnswlib) for very large videos.
+#            Vectors can be stored as float16 or int8 (VECTOR_PRECISION)
+
+# Videos with at least this many chunks get an HNSW graph (if hnswlib is installed)
+HNSW_MIN_VECTORS = int(os.getenv("HNSW_MIN_VECTORS", 5000))
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+# Opened per-video indexes kept per worker
+MEMMAP_OPEN_VIDEOS = int(os.getenv("MEMMAP_OPEN_VIDEOS", 256))
+# Quantized search keeps top_k * RESCORE_FACTOR candidates for full-precision rescoring
+RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", 4))
+# Rows per block when scanning quantized vectors, bounds the float32 scratch memory
+SCAN_BLOCK_ROWS = 1024
+
+PRECISIONS = ("float32", "float16", "int8")
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns the stored form of float32 vectors and, for int8, the per-vector
+    scale (max |x| / 127) needed to dequantize them.
+    """
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.zeros(0, np.float32)
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return np.ascontiguousarray(vectors, dtype=np.float32), None
+
+def dequantize(vectors: np.ndarray, scales: Optional[np.ndarray], rows=slice(None)) -> np.ndarray:
+    block = np.asarray(vectors[rows], dtype=np.float32)
+    if scales is not None:
+        block = block * scales[rows][:, None]
+    return block
+
+def squared_norms(vectors: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """|x|^2 of each stored vector as a query scan sees it (dequantized), block by block."""
+    norms = np.zeros(len(vectors), np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = dequantize(vectors, scales, slice(start, start + SCAN_BLOCK_ROWS))
+        norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+    return norms
+
+class VectorBackend(ABC):
+    """
+    Interface shared by the backends. Chunks are dicts with 'id', 'text',
+    'metadata' and, from query(), 'distance' (squared L2, smaller is closer).
+    """
+    name = "base"
+
+    @abstractmethod
+    def ids(self, video_id: str) -> Set[str]:
+        ...
+
+    @abstractmethod
+    def upsert(self, video_id: str, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        ...
+
+    @abstractmethod
+    def update_metadata(self, video_id: str, ids: List[str], metadatas: List[Dict]):
+        ...
+
+    @abstractmethod
+    def delete(self, video_id: str, ids: Optional[List[str]] = None) -> int:
+        """Deletes the given chunks, or every chunk of the video when ids is None."""
+        ...
+
+    @abstractmethod
+    def finalize(self, video_id: str):
+        """Called once a store has written all of a video's chunks, to build derived search structures."""
+        ...
+
+    @abstractmethod
+    def query(self, video_id: str, embedding: List[float], n_results: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get(self, video_id: str, ids: Optional[List[str]] = None) -> List[Dict]:
+        """Chunks of the video without distances; all of them when ids is None."""
+        ...
+
+    @abstractmethod
+    def count(self, video_id: str) -> int:
+        ...
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, path: str):
+        import chromadb
+        os.makedirs(path, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=path)
+        # Create or get collection for video chunks
+        self.collection = self.client.get_or_create_collection(
+            name="video_transcripts",
+            metadata={"description": "Chunked video transcripts with embeddings"}
+        )
+
+    def ids(self, video_id: str) -> Set[str]:
+        results = self.collection.get(where={"video_id": video_id}, include=[])
+        return set(results['ids'] or [])
+
+    def upsert(self, video_id, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update_metadata(self, video_id, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, video_id, ids=None) -> int:
+        if ids is None:
+            ids = list(self.ids(video_id))
+        if ids:
+            self.collection.delete(ids=ids)
+        return len(ids or [])
+
+    def finalize(self, video_id):
+        # Chroma updates its own HNSW index on every write
+        pass
+
+    def query(self, video_id, embedding, n_results) -> List[Dict]:
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where={"video_id": video_id}
+        )
+        chunks = []
+        if results['ids'] and results['ids'][0]:
+            for i, chunk_id in enumerate(results['ids'][0]):
+                chunks.append({
+                    'id': chunk_id,
+                    'text': results['documents'][0][i],
+                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
+                    'distance': results['distances'][0][i] if results['distances'] else 0
+                })
+        return chunks
+
+    def get(self, video_id, ids=None) -> List[Dict]:
+        if ids is None:
+            results = self.collection.get(where={"video_id": video_id}, include=["documents", "metadatas"])
+        else:
+            results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        return [
+            {
+                'id': chunk_id,
+                'text': results['documents'][i],
+                'metadata': results['metadatas'][i] if results['metadatas'] else {}
+            }
+            for i, chunk_id in enumerate(results['ids'])
+        ]
+
+    def count(self, video_id) -> int:
+        return len(self.ids(video_id))
+
+class _OpenVideo:
+    """
+    A loaded per-video index: state from index.json plus read-only mappings
+    of the vectors, their norms and the chunk records. Only the ids, the
+    id -> row map and an HNSW graph live in the worker's own memory.
+    """
+
+    def __init__(self, directory: str, state: Dict, stamp: int):
+        self.directory = directory
+        self.state = state
+        self.stamp = stamp
+        self.ids: List[str] = state["ids"]
+        self.positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.version = state["version"]
+        # Indexes written before quantization support are float32
+        self.precision = state.get("precision", "float32")
+        # Read-only mappings: every worker shares the same page-cache pages
+        self.vectors = np.load(self.path("vectors"), mmap_mode="r")
+        self.scales = np.load(self.path("scales"), mmap_mode="r") if self.precision == "int8" else None
+        # float32 copy of quantized vectors, only read for the rescored candidates
+        self.full = np.load(self.path("full"), mmap_mode="r") if state.get("full") else None
+        # Indexes written before norms and chunk records were stored keep them in memory
+        self.sq_norms = np.load(self.path("norms"), mmap_mode="r") if state.get("norms") else squared_norms(self.vectors, self.scales)
+        self.documents = state.get("documents")
+        self.metadatas = state.get("metadatas")
+        if self.documents is None:
+            # One JSON record per line; offsets-<version>.npy holds where each starts
+            self.offsets = np.load(self.path("offsets"), mmap_mode="r")
+            with open(self.path("chunks"), "rb") as f:
+                self.records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Leading rows covered by hnsw-<version>.bin; the graph is only
+        # searched once finalize() has extended it to every row
+        self.graph_rows = state.get("graph_rows", len(self.ids) if state.get("hnsw") else 0)
+        self.graph = None
+        if self.ids and self.graph_rows == len(self.ids) and hnswlib is not None:
+            self.graph = hnswlib.Index(space="l2", dim=state["dim"])
+            self.graph.load_index(self.path("hnsw"), max_elements=len(self.ids))
+            self.graph.set_ef(max(HNSW_EF_SEARCH, 1))
+
+    def path(self, kind: str) -> str:
+        return _version_path(self.directory, kind, self.version)
+
+    def chunk(self, position: int) -> Dict:
+        if self.documents is not None:
+            return {'id': self.ids[position], 'text': self.documents[position], 'metadata': self.metadatas[position]}
+        record = json.loads(self.records[self.offsets[position]:self.offsets[position + 1]])
+        return {'id': self.ids[position], 'text': record["text"], 'metadata': record["metadata"]}
+
+    def dequantized(self, rows=slice(None)) -> np.ndarray:
+        return dequantize(self.vectors, self.scales, rows)
+
+    def float32(self, rows=slice(None)) -> np.ndarray:
+        """
+        Writable float32 vectors, from the full-precision file when there is
+        one, else dequantized; such an index keeps no full-precision file on
+        rewrite, since it would only hold dequantized values.
+        """
+        return np.array(self.full[rows] if self.full is not None else self.dequantized(rows), dtype=np.float32)
+
+    def scan(self, query: np.ndarray) -> np.ndarray:
+        """Squared L2 from the query to every stored vector, on the stored (compact) form."""
+        if self.precision == "float32":
+            return self.sq_norms - 2 * (self.vectors @ query) + query @ query
+        dots = np.empty(len(self.ids), np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            rows = slice(start, start + SCAN_BLOCK_ROWS)
+            block = self.vectors[rows].astype(np.float32)
+            dots[rows] = block @ query
+        if self.scales is not None:
+            # Scale the dot products, not every element of the rows
+            dots *= self.scales
+        return self.sq_norms - 2 * dots + query @ query
+
+    def rescore(self, query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Exact squared L2 for a few candidates, from the float32 copy if one is stored."""
+        candidates = self.full[positions] if self.full is not None else self.dequantized(positions)
+        diff = candidates - query
+        return np.einsum("ij,ij->i", diff, diff)
+
+# Per-version files of a video directory and their extensions
+_VERSION_FILES = {
+    "vectors": "npy", "scales": "npy", "full": "npy", "norms": "npy", "hnsw": "bin",
+    "chunks": "jsonl", "offsets": "npy",
+}
+
+def _version_path(directory: str, kind: str, version: str) -> str:
+    return os.path.join(directory, f"{kind}-{version}.{_VERSION_FILES[kind]}")
+
+def _link(source: str, target: str):
+    """Hard-links an unchanged file into a new version, copying where links are unsupported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+class MemmapBackend(VectorBackend):
+    """
+    One directory per video holding index.json (ids, layout and the current
+    version) and per-version files: vectors-<version>.npy, norms-<version>.npy
+    (|x|^2 of each row, for the scan) and chunks-<version>.jsonl with
+    offsets-<version>.npy (text and metadata, one JSON record per row). With
+    float16 or int8 precision, vectors-<version>.npy holds the compact form
+    that queries scan (plus scales-<version>.npy for int8) and, when rescore
+    is on, full-<version>.npy keeps float32 vectors to rescore the top
+    candidates; queries only page in the rows they rescore. A video keeps the
+    precision it was first written with until it is deleted, so changing
+    VECTOR_PRECISION applies to newly indexed videos. Writers produce a new
+    version and swap index.json atomically, so readers in other workers
+    never see a half-written index; they notice the change from its mtime.
+    Files a write leaves unchanged are hard-linked into the new version.
+    Concurrent writers to the same video are last-writer-wins.
+
+    Every per-version file except the graph is memory-mapped read-only, so
+    gunicorn workers share it through the page cache. Each worker parses its
+    own copy of the ids, and hnswlib loads hnsw-<version>.bin into private
+    memory: about the file's size per open video and worker (graph_mib in
+    benchmarks/bench_vector_backends.py).
+
+    Writes never build the HNSW graph: appended rows keep the graph of the
+    rows before them, and finalize() builds or extends it once per store.
+    Until then the video is searched exactly.
+    """
+    name = "memmap"
+
+    def __init__(self, path: str, hnsw_min_vectors: int = HNSW_MIN_VECTORS, precision: str = "float32", rescore: bool = True):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown VECTOR_PRECISION: {precision}")
+        self.path = path
+        self.hnsw_min_vectors = hnsw_min_vectors
+        self.precision = precision
+        self.rescore = rescore and precision != "float32"
+        os.makedirs(path, exist_ok=True)
+        self._open = TTLCache(maxsize=MEMMAP_OPEN_VIDEOS, ttl=3600)
+        self._write_lock = threading.Lock()
+
+    def _dir(self, video_id: str) -> str:
+        # Two-level fan-out keeps directories small at 100k+ videos
+        shard = hashlib.sha1(video_id.encode()).hexdigest()[:2]
+        return os.path.join(self.path, shard, re.sub(r"[^A-Za-z0-9_-]", "_", video_id))
+
+    def _load(self, video_id: str) -> Optional[_OpenVideo]:
+        directory = self._dir(video_id)
+        state_path = os.path.join(directory, "index.json")
+        for _ in range(3):
+            try:
+                stamp = os.stat(state_path).st_mtime_ns
+            except FileNotFoundError:
+                return None
+            opened = self._open.get(video_id)
+            if opened is not None and opened.stamp == stamp:
+                return opened
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+                opened = _OpenVideo(directory, state, stamp)
+            except FileNotFoundError:
+                # A writer swapped versions between our reads; try again
+                continue
+            self._open.set(video_id, opened)
+            return opened
+        return None
+
+    def _write(
+        self,
+        video_id: str,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        layout: Tuple[str, bool],
+        vectors: Optional[np.ndarray] = None,
+        base: Optional[_OpenVideo] = None,
+        graph_rows: int = 0,
+        graph=None
+    ):
+        """
+        Writes a new version of the video. layout is (precision, full): the
+        stored form, and whether float32 copies are kept. With vectors None
+        the vector files of base are kept. The first graph_rows rows of base's
+        HNSW graph are kept unless a new graph covering them is given.
+        """
+        precision, full = layout
+        directory = self._dir(video_id)
+        if not ids:
+            shutil.rmtree(directory, ignore_errors=True)
+            self._open.invalidate(video_id)
+            return
+        os.makedirs(directory, exist_ok=True)
+        version = uuid.uuid4().hex[:12]
+        if vectors is None:
+            for kind in ("vectors", "scales", "full", "norms"):
+                if os.path.exists(base.path(kind)):
+                    _link(base.path(kind), _version_path(directory, kind, version))
+            if not base.state.get("norms"):
+                np.save(_version_path(directory, "norms", version), base.sq_norms)
+            dim = base.state["dim"]
+        else:
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            stored, scales = quantize(vectors, precision)
+            np.save(_version_path(directory, "vectors", version), stored)
+            if scales is not None:
+                np.save(_version_path(directory, "scales", version), scales)
+            if full:
+                np.save(_version_path(directory, "full", version), vectors)
+            np.save(_version_path(directory, "norms", version), squared_norms(stored, scales))
+            dim = int(vectors.shape[1])
+        if graph is not None:
+            graph.save_index(_version_path(directory, "hnsw", version))
+        elif graph_rows:
+            _link(base.path("hnsw"), _version_path(directory, "hnsw", version))
+
+        offsets = [0]
+        with open(_version_path(directory, "chunks", version), "wb") as f:
+            for document, metadata in zip(documents, metadatas):
+                line = json.dumps({"text": document, "metadata": metadata}).encode() + b"\n"
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(_version_path(directory, "offsets", version), np.asarray(offsets, dtype=np.int64))
+
+        state = {
+            "version": version,
+            "dim": dim,
+            "precision": precision,
+            "full": full,
+            "norms": True,
+            "graph_rows": graph_rows,
+            "ids": ids,
+        }
+        tmp_path = os.path.join(directory, f"index.json.{version}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, os.path.join(directory, "index.json"))
+        self._open.invalidate(video_id)
+
+        # Readers that still map an old version keep a valid mapping after unlink
+        for name in os.listdir(directory):
+            if name.startswith(tuple(f"{kind}-" for kind in _VERSION_FILES)) and version not in name:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def _current(self, video_id: str):
+        """The opened video (None if it has no index), its ids, documents, metadata and layout."""
+        opened = self._load(video_id)
+        if opened is None:
+            return None, [], [], [], (self.precision, self.rescore)
+        layout = (opened.precision, opened.full is not None)
+        chunks = [opened.chunk(p) for p in range(len(opened.ids))]
+        documents = [chunk['text'] for chunk in chunks]
+        metadatas = [chunk['metadata'] for chunk in chunks]
+        return opened, list(opened.ids), documents, metadatas, layout
+
+    def ids(self, video_id) -> Set[str]:
+        opened = self._load(video_id)
+        return set(opened.ids) if opened else set()
+
+    def upsert(self, video_id, ids, embeddings, documents, metadatas):
+        new_vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._write_lock:
+            opened, current_ids, current_docs, current_metas, layout = self._current(video_id)
+            if opened is None:
+                vectors = np.zeros((0, new_vectors.shape[1]), dtype=np.float32)
+            else:
+                vectors = opened.float32()
+            graph_rows = opened.graph_rows if opened else 0
+            positions = {chunk_id: i for i, chunk_id in enumerate(current_ids)}
+            appended = []
+            for row, chunk_id in enumerate(ids):
+                if chunk_id in positions:
+                    i = positions[chunk_id]
+                    vectors[i] = new_vectors[row]
+                    current_docs[i] = documents[row]
+                    current_metas[i] = metadatas[row]
+                    # The graph still holds the old vector of this row
+                    graph_rows = min(graph_rows, i)
+                else:
+                    positions[chunk_id] = len(current_ids)
+                    current_ids.append(chunk_id)
+                    current_docs.append(documents[row])
+                    current_metas.append(metadatas[row])
+                    appended.append(row)
+            if appended:
+                vectors = np.vstack([vectors, new_vectors[appended]])
+            self._write(video_id, current_ids, current_docs, current_metas, layout, vectors, opened, graph_rows)
+
+    def update_metadata(self, video_id, ids, metadatas):
+        with self._write_lock:
+            opened, current_ids, current_docs, current_metas, layout = self._current(video_id)
+            changed = False
+            for chunk_id, metadata in zip(ids, metadatas):
+                i = opened.positions.get(chunk_id) if opened else None
+                if i is not None and current_metas[i] != metadata:
+                    current_metas[i] = metadata
+                    changed = True
+            if changed:
+                self._write(video_id, current_ids, current_docs, current_metas, layout, base=opened, graph_rows=opened.graph_rows)
+
+    def delete(self, video_id, ids=None) -> int:
+        with self._write_lock:
+            opened, current_ids, current_docs, current_metas, layout = self._current(video_id)
+            if ids is None:
+                self._write(video_id, [], [], [], layout)
+                return len(current_ids)
+            drop = set(ids)
+            keep = [i for i, chunk_id in enumerate(current_ids) if chunk_id not in drop]
+            if len(keep) == len(current_ids):
+                return 0
+            # Rows after the first dropped one move, so the graph keeps only the rows before it
+            first_dropped = next(i for i, chunk_id in enumerate(current_ids) if chunk_id in drop)
+            self._write(
+                video_id,
+                [current_ids[i] for i in keep],
+                [current_docs[i] for i in keep],
+                [current_metas[i] for i in keep],
+                layout,
+                opened.float32()[keep],
+                opened,
+                min(opened.graph_rows, first_dropped)
+            )
+            return len(current_ids) - len(keep)
+
+    def finalize(self, video_id):
+        """Builds the HNSW graph of a large video, or adds the rows appended since it was built."""
+        if hnswlib is None:
+            return
+        with self._write_lock:
+            opened, current_ids, current_docs, current_metas, layout = self._current(video_id)
+            count = len(current_ids)
+            if opened is None or count < self.hnsw_min_vectors or opened.graph_rows == count:
+                return
+            graph = hnswlib.Index(space="l2", dim=opened.state["dim"])
+            if opened.graph_rows:
+                graph.load_index(opened.path("hnsw"), max_elements=count)
+            else:
+                graph.init_index(max_elements=count, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+            rows = slice(opened.graph_rows, count)
+            graph.add_items(opened.float32(rows), np.arange(opened.graph_rows, count))
+            self._write(video_id, current_ids, current_docs, current_metas, layout, base=opened, graph_rows=count, graph=graph)
+
+    def query(self, video_id, embedding, n_results) -> List[Dict]:
+        opened = self._load(video_id)
+        if opened is None or not opened.ids:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != opened.state["dim"]:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {opened.state['dim']}")
+        k = min(n_results, len(opened.ids))
+
+        if opened.graph is not None:
+            labels, distances = opened.graph.knn_query(query, k=k)
+            positions, distances = labels[0], distances[0]
+        else:
+            # Squared L2 on the stored form: |x|^2 - 2 x.q + |q|^2
+            all_distances = opened.scan(query)
+            # Quantized vectors: over-fetch candidates, then rescore them exactly
+            candidates = min(len(opened.ids), k * RESCORE_FACTOR) if opened.precision != "float32" else k
+            positions = np.argpartition(all_distances, candidates - 1)[:candidates]
+            distances = opened.rescore(query, positions) if opened.precision != "float32" else all_distances[positions]
+            best = np.argsort(distances)[:k]
+            positions, distances = positions[best], distances[best]
+
+        return [{**opened.chunk(p), 'distance': float(max(d, 0.0))} for p, d in zip(positions, distances)]
+
+    def get(self, video_id, ids=None) -> List[Dict]:
+        opened = self._load(video_id)
+        if opened is None:
+            return []
+        positions = range(len(opened.ids)) if ids is None else [opened.positions[i] for i in ids if i in opened.positions]
+        return [opened.chunk(p) for p in positions]
+
+    def count(self, video_id) -> int:
+        opened = self._load(video_id)
+        return len(opened.ids) if opened else 0
+
+def create_backend(name: str, path: str, precision: str = "float32", rescore: bool = True) -> VectorBackend:
+    if name == "chroma":
+        if precision != "float32":
+            print(f"DEBUG: VECTOR_PRECISION={precision} only applies to the memmap backend, Chroma stores float32")
+        return ChromaBackend(path)
+    if name == "memmap":
+        return MemmapBackend(path, precision=precision, rescore=rescore)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {name}")
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+class EmbeddingModelMismatch(ValueError):
+    """A query embedding does not come from the model a video was indexed with."""
+
+def content_hash(chunk_ids: Iterable[str]) -> str:
+    # Chunk ids are already hashes of the chunk text, so this covers the content
+    return hashlib.sha256("\n".join(sorted(chunk_ids)).encode()).hexdigest()
+
+class ManifestStore:
+    """
+    Per-video index metadata (chunk count, embedding model, dimension,
+    content hash, timestamps) in a SQLite file next to the vector index,
+    so "is this video indexed, and with which model" is one primary-key
+    lookup instead of a scan of the vector store.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL lets every gunicorn worker read while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS manifests (
+                    video_id TEXT PRIMARY KEY,
+                    chunk_count INTEGER NOT NULL,
+                    model TEXT,
+                    dim INTEGER,
+                    content_hash TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )"""
+            )
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT video_id, chunk_count, model, dim, content_hash, created_at, updated_at "
+                "FROM manifests WHERE video_id = ?",
+                (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("video_id", "chunk_count", "model", "dim", "content_hash", "created_at", "updated_at")
+        return dict(zip(keys, row))
+
+    def put(self, video_id: str, chunk_count: int, model: Optional[str], dim: Optional[int], digest: str):
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO manifests (video_id, chunk_count, model, dim, content_hash, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(video_id) DO UPDATE SET
+                       chunk_count = excluded.chunk_count,
+                       model = excluded.model,
+                       dim = excluded.dim,
+                       content_hash = excluded.content_hash,
+                       updated_at = excluded.updated_at""",
+                (video_id, chunk_count, model, dim, digest, now, now)
+            )
+
+    def delete(self, video_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM manifests WHERE video_id = ?", (video_id,))
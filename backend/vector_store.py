@@ -1,80 +1,207 @@
-import chromadb
-
 import os
-from typing import List, Dict, Optional
+import time
+import asyncio
+import hashlib
+from itertools import islice
+from typing import Iterable, List, Dict, Optional, Set, Tuple
 from utils.embedding_utils import generate_embeddings
+from utils.embedding_batcher import embed_texts
+from utils.embedding_service import RERANK_MODEL_NAME, rerank_scores, embedding_model_name
+from utils.lexical_index import BM25Index, reciprocal_rank_fusion
+from utils.ttl_cache import TTLCache
+from vector_backends import create_backend
+from vector_manifest import ManifestStore, EmbeddingModelMismatch, content_hash
 
-# Initialize ChromaDB client
+# Storage backend: "chroma" (default) or "memmap", see vector_backends
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
 CHROMA_PATH = os.path.join(os.path.dirname(__file__), "chroma_db")
-os.makedirs(CHROMA_PATH, exist_ok=True)
+MEMMAP_PATH = os.getenv("MEMMAP_INDEX_PATH", os.path.join(os.path.dirname(__file__), "vector_index"))
+
+# Stored vector precision (memmap backend): float32, float16 or int8. The
+# compact forms are rescored with float32 copies unless VECTOR_RESCORE=false.
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION", "float32")
+VECTOR_RESCORE = os.getenv("VECTOR_RESCORE", "true").lower() == "true"
+
+STORE_PATH = CHROMA_PATH if VECTOR_BACKEND == "chroma" else MEMMAP_PATH
+
+backend = create_backend(VECTOR_BACKEND, STORE_PATH, VECTOR_PRECISION, VECTOR_RESCORE)
+# Per-video chunk count, embedding model and dimension, kept with the index
+manifests = ManifestStore(os.path.join(STORE_PATH, "manifests.sqlite3"))
+
+# Chunks embedded and written per backend call by store_video_chunks_async
+STORE_BATCH_CHUNKS = int(os.getenv("STORE_BATCH_CHUNKS", 64))
 
-client = chromadb.PersistentClient(path=CHROMA_PATH)
+# Hybrid retrieval: dense and BM25 candidates are fused with reciprocal rank
+# fusion, then optionally re-ranked by a cross-encoder (RERANK_MODEL)
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+RERANK_ENABLED = bool(RERANK_MODEL_NAME)
 
-# Create or get collection for video chunks
-collection = client.get_or_create_collection(
-    name="video_transcripts",
-    metadata={"description": "Chunked video transcripts with embeddings"}
+# Per-video BM25 indexes built from the stored chunks. Writes in this process
+# invalidate them; the TTL bounds staleness after re-indexing by other workers.
+_lexical_indexes = TTLCache(
+    maxsize=int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", 64)),
+    ttl=float(os.getenv("LEXICAL_INDEX_TTL_SECONDS", 600))
 )
+# stage -> [calls, total milliseconds]
+_stage_timings: Dict[str, List[float]] = {}
+
+def chunk_ids(video_id: str, chunks: List[Dict]) -> List[str]:
+    """Content-addressed ids: the same chunk text always maps to the same id."""
+    return [f"{video_id}_{hashlib.sha1(chunk['text'].encode()).hexdigest()[:16]}" for chunk in chunks]
+
+def _chunk_metadata(video_id: str, chunk: Dict) -> Dict:
+    return {
+        "video_id": video_id,
+        "chunk_id": chunk['id'],
+        "token_count": chunk.get('token_count', 0),
+        "start_token": chunk.get('start_token', 0),
+        "end_token": chunk.get('end_token', 0),
+        # Segment timings, when the transcript had them
+        **{key: chunk[key] for key in ("start_time", "end_time") if key in chunk}
+    }
+
+def get_video_chunk_ids(video_id: str) -> Set[str]:
+    return backend.ids(video_id)
+
+def get_video_manifest(video_id: str) -> Optional[Dict]:
+    """Index metadata for a video, or None if it has not been indexed (since manifests were added)."""
+    return manifests.get(video_id)
+
+def _record_manifest(video_id: str, chunk_ids: Set[str], model: str, embeddings: List[List[float]]):
+    if not chunk_ids:
+        manifests.delete(video_id)
+        return
+    previous = manifests.get(video_id) or {}
+    dim = len(embeddings[0]) if embeddings else previous.get("dim")
+    manifests.put(video_id, len(chunk_ids), model, dim, content_hash(chunk_ids))
+
+def _model_changed(video_id: str, existing: Set[str], model: str) -> bool:
+    """
+    True if the stored vectors come from another model. They cannot be mixed
+    with new ones, so every chunk is re-embedded and the index replaced.
+    """
+    manifest = manifests.get(video_id)
+    if not existing or not manifest or not manifest["model"] or manifest["model"] == model:
+        return False
+    print(f"DEBUG: Re-embedding {video_id}: index model {manifest['model']} -> {model}")
+    return True
+
+def _query_model(video_id: str, use_openai_embeddings: bool) -> bool:
+    """
+    Picks the embedding path (OpenAI or local) matching the model the video
+    was indexed with. Raises EmbeddingModelMismatch if neither configured
+    model produced the index.
+    """
+    manifest = manifests.get(video_id)
+    if not manifest or not manifest["model"]:
+        return use_openai_embeddings
+    for use_openai in (use_openai_embeddings, not use_openai_embeddings):
+        if embedding_model_name(use_openai) == manifest["model"]:
+            return use_openai
+    raise EmbeddingModelMismatch(
+        f"Video {video_id} was indexed with {manifest['model']}, which is not a configured embedding model"
+    )
+
+def _check_query_dimension(video_id: str, query_embedding: List[float]):
+    manifest = manifests.get(video_id)
+    if manifest and manifest["dim"] and len(query_embedding) != manifest["dim"]:
+        raise EmbeddingModelMismatch(
+            f"Query embedding has {len(query_embedding)} dimensions, the index of {video_id} has {manifest['dim']}"
+        )
+
+def _partition(video_id: str, chunks: List[Dict], existing: Set[str], seen: Set[str]) -> Tuple[List, List]:
+    """
+    Splits chunks into (fresh, unchanged) lists of (id, chunk). Repeats of
+    a chunk already handled in this run are dropped.
+    """
+    fresh, unchanged = [], []
+    for chunk_id, chunk in zip(chunk_ids(video_id, chunks), chunks):
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        (unchanged if chunk_id in existing else fresh).append((chunk_id, chunk))
+    return fresh, unchanged
+
+def _write_chunks(video_id: str, fresh: List, embeddings: List[List[float]], unchanged: List):
+    if fresh:
+        backend.upsert(
+            video_id,
+            ids=[chunk_id for chunk_id, _ in fresh],
+            embeddings=embeddings,
+            documents=[chunk['text'] for _, chunk in fresh],
+            metadatas=[_chunk_metadata(video_id, chunk) for _, chunk in fresh]
+        )
+        _lexical_indexes.invalidate(video_id)
+    if unchanged:
+        # Same text, so the embedding is still valid; only positions/timings may move
+        backend.update_metadata(
+            video_id,
+            ids=[chunk_id for chunk_id, _ in unchanged],
+            metadatas=[_chunk_metadata(video_id, chunk) for _, chunk in unchanged]
+        )
+
+def _replace_chunks(video_id: str, fresh: List, embeddings: List[List[float]]):
+    """Swaps the whole index of a video for new chunks, once their embeddings exist."""
+    backend.delete(video_id)
+    _write_chunks(video_id, fresh, embeddings, [])
+    _lexical_indexes.invalidate(video_id)
+
+def _prune(video_id: str, existing: Set[str], seen: Set[str]) -> int:
+    stale = list(existing - seen)
+    if stale:
+        backend.delete(video_id, stale)
+        _lexical_indexes.invalidate(video_id)
+    return len(stale)
 
 def store_video_chunks(
     video_id: str, 
     chunks: List[Dict], 
     use_openai_embeddings: bool = True
-) -> int:
+) -> Dict[str, int]:
     """
-    Store video chunks with embeddings in ChromaDB.
+    Store video chunks with embeddings in the vector backend, idempotently.
+
+    Chunk ids are derived from a hash of the chunk text, so chunks already
+    stored for the video skip embedding (all are re-embedded if the video
+    was indexed with a different model), and stored chunks that are not in `chunks` any more
+    are deleted. The video's manifest is updated afterwards.
     
     Args:
         video_id: Unique identifier for the video
-        chunks: List of chunk dicts from chunk_text()
+        chunks: List of chunk dicts from chunk_text() or iter_transcript_chunks()
         use_openai_embeddings: Whether to use OpenAI or local embeddings
     
     Returns:
-        Number of chunks stored
+        Counts of 'added', 'unchanged' and 'removed' chunks
     """
-    if not chunks:
-        return 0
-    
-    # Extract texts
-    texts = [chunk['text'] for chunk in chunks]
-    
-    # Generate embeddings
-    try:
-        embeddings = generate_embeddings(texts, use_openai=use_openai_embeddings)
-    except Exception as e:
-        print(f"Embedding generation failed: {e}")
-        # Fallback to local embeddings
-        embeddings = generate_embeddings(texts, use_openai=False)
-    
-    # Prepare data for ChromaDB
-    ids = [f"{video_id}_chunk_{chunk['id']}" for chunk in chunks]
-    metadatas = [
-        {
-            "video_id": video_id,
-            "chunk_id": chunk['id'],
-            "token_count": chunk.get('token_count', 0),
-            "start_token": chunk.get('start_token', 0),
-            "end_token": chunk.get('end_token', 0)
-        }
-        for chunk in chunks
-    ]
-    
-    # Store in ChromaDB
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=texts,
-        metadatas=metadatas
-    )
-    
-    print(f"Stored {len(chunks)} chunks for video {video_id}")
-    return len(chunks)
+    model = embedding_model_name(use_openai_embeddings)
+    existing, seen = get_video_chunk_ids(video_id), set()
+    replace = _model_changed(video_id, existing, model)
+    fresh, unchanged = _partition(video_id, chunks, set() if replace else existing, seen)
+
+    # Generate embeddings for new text only. No fallback to the other model:
+    # one video's vectors must all come from the same model. If this fails
+    # the old index is left untouched.
+    embeddings = generate_embeddings([chunk['text'] for _, chunk in fresh], use_openai=use_openai_embeddings) if fresh else []
+
+    if replace:
+        _replace_chunks(video_id, fresh, embeddings)
+        counts = {"added": len(fresh), "unchanged": 0, "removed": len(existing)}
+    else:
+        _write_chunks(video_id, fresh, embeddings, unchanged)
+        counts = {"added": len(fresh), "unchanged": len(unchanged), "removed": _prune(video_id, existing, seen)}
+    backend.finalize(video_id)
+    _record_manifest(video_id, seen, model, embeddings)
+    print(f"Stored chunks for video {video_id}: {counts}")
+    return counts
 
 def retrieve_relevant_chunks(
     video_id: str, 
     query: str, 
     top_k: int = 5,
-    use_openai_embeddings: bool = True
+    use_openai_embeddings: bool = True,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict]:
     """
     Retrieve the most relevant chunks for a query using semantic search.
@@ -84,34 +211,210 @@ def retrieve_relevant_chunks(
         query: User's question or search query
         top_k: Number of chunks to retrieve
         use_openai_embeddings: Whether to use OpenAI embeddings for query
+        query_embedding: Precomputed query embedding (skips embedding)
     
     Returns:
         List of dicts with 'text', 'metadata', 'distance'
     """
-    # Generate query embedding
-    try:
-        query_embedding = generate_embeddings([query], use_openai=use_openai_embeddings)[0]
-    except:
-        query_embedding = generate_embeddings([query], use_openai=False)[0]
+    # Generate query embedding with the model the video was indexed with
+    if query_embedding is None:
+        use_openai = _query_model(video_id, use_openai_embeddings)
+        query_embedding = generate_embeddings([query], use_openai=use_openai)[0]
+    _check_query_dimension(video_id, query_embedding)
     
-    # Query ChromaDB
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k,
-        where={"video_id": video_id}
+    # Query the vector backend
+    return [
+        {'text': hit['text'], 'metadata': hit['metadata'], 'distance': hit['distance']}
+        for hit in backend.query(video_id, query_embedding, top_k)
+    ]
+
+def get_lexical_index(video_id: str) -> BM25Index:
+    index = _lexical_indexes.get(video_id)
+    if index is None:
+        chunks = backend.get(video_id)
+        index = BM25Index([chunk['id'] for chunk in chunks], [chunk['text'] for chunk in chunks])
+        _lexical_indexes.set(video_id, index)
+    return index
+
+def _record_timings(timings: Dict[str, float]):
+    for stage, ms in timings.items():
+        entry = _stage_timings.setdefault(stage, [0, 0.0])
+        entry[0] += 1
+        entry[1] += ms
+
+def retrieve_hybrid_chunks(
+    video_id: str,
+    query: str,
+    top_k: int = 5,
+    use_openai_embeddings: bool = True,
+    query_embedding: Optional[List[float]] = None,
+    rerank: Optional[bool] = None
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """
+    Retrieve chunks by fusing dense similarity with BM25 keyword matches,
+    so exact terms (formulas, names, identifiers) are found even when their
+    embedding is not close to the question's.
+
+    Args:
+        video_id: Video identifier to search within
+        query: User's question or search query
+        top_k: Number of chunks to return
+        use_openai_embeddings: Whether to use OpenAI embeddings for query
+        query_embedding: Precomputed query embedding (skips embedding)
+        rerank: Re-rank fused candidates with the cross-encoder
+            (defaults to on when RERANK_MODEL is set)
+
+    Returns:
+        (chunks, timings): chunk dicts as from retrieve_relevant_chunks()
+        plus 'score', and milliseconds spent per stage
+    """
+    timings = {}
+    clock = time.perf_counter()
+
+    def lap(stage: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] = round((now - clock) * 1000, 2)
+        clock = now
+
+    if query_embedding is None:
+        use_openai = _query_model(video_id, use_openai_embeddings)
+        query_embedding = generate_embeddings([query], use_openai=use_openai)[0]
+        lap("embed")
+    _check_query_dimension(video_id, query_embedding)
+
+    candidates = max(HYBRID_CANDIDATES, top_k)
+    chunks_by_id = {}
+    dense_ids = []
+    for hit in backend.query(video_id, query_embedding, candidates):
+        dense_ids.append(hit['id'])
+        chunks_by_id[hit['id']] = {'text': hit['text'], 'metadata': hit['metadata'], 'distance': hit['distance']}
+    lap("dense")
+
+    lexical_ids = [chunk_id for chunk_id, _ in get_lexical_index(video_id).search(query, candidates)]
+    lap("lexical")
+
+    fused = reciprocal_rank_fusion([dense_ids, lexical_ids], RRF_K)[:candidates]
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in chunks_by_id]
+    if missing:
+        # Keyword-only hits have no dense distance
+        for hit in backend.get(video_id, missing):
+            chunks_by_id[hit['id']] = {'text': hit['text'], 'metadata': hit['metadata'], 'distance': None}
+    ranked = []
+    for chunk_id, score in fused:
+        if chunk_id in chunks_by_id:
+            ranked.append({**chunks_by_id[chunk_id], 'score': score})
+    lap("fuse")
+
+    if RERANK_ENABLED if rerank is None else rerank:
+        scores = rerank_scores(query, [chunk['text'] for chunk in ranked])
+        for chunk, score in zip(ranked, scores):
+            chunk['score'] = score
+        ranked.sort(key=lambda chunk: chunk['score'], reverse=True)
+        lap("rerank")
+
+    timings["total"] = round(sum(timings.values()), 2)
+    _record_timings(timings)
+    return ranked[:top_k], timings
+
+def get_retrieval_stats() -> Dict:
+    """Average retrieval latency per stage in this worker."""
+    return {
+        "backend": backend.name,
+        "precision": getattr(backend, "precision", "float32"),
+        "lexical_indexes": _lexical_indexes.stats(),
+        "rerank": RERANK_ENABLED,
+        "stages_ms": {
+            stage: {"calls": int(calls), "avg": round(total / calls, 2)}
+            for stage, (calls, total) in _stage_timings.items()
+        },
+    }
+
+async def store_video_chunks_async(
+    video_id: str,
+    chunks: Iterable[Dict],
+    use_openai_embeddings: bool = True
+) -> Dict[str, int]:
+    """
+    Async variant of store_video_chunks() for request handlers. chunks may
+    be a generator; it is consumed STORE_BATCH_CHUNKS at a time. New chunks
+    are embedded through the shared micro-batcher and backend calls run in
+    a worker thread. When the video was indexed with another model, the new
+    chunks are held until all are embedded and then replace the old index.
+    """
+    model = embedding_model_name(use_openai_embeddings)
+    existing, seen = await asyncio.to_thread(get_video_chunk_ids, video_id), set()
+    replace = await asyncio.to_thread(_model_changed, video_id, existing, model)
+    counts = {"added": 0, "unchanged": 0, "removed": 0}
+    sample = []
+    held, held_embeddings = [], []
+    chunks = iter(chunks)
+
+    while batch := list(islice(chunks, STORE_BATCH_CHUNKS)):
+        fresh, unchanged = _partition(video_id, batch, set() if replace else existing, seen)
+        embeddings = await embed_texts([chunk['text'] for _, chunk in fresh], use_openai=use_openai_embeddings) if fresh else []
+        if replace:
+            held.extend(fresh)
+            held_embeddings.extend(embeddings)
+        else:
+            await asyncio.to_thread(_write_chunks, video_id, fresh, embeddings, unchanged)
+        counts["added"] += len(fresh)
+        counts["unchanged"] += len(unchanged)
+        sample = sample or embeddings[:1]
+
+    # Only reached once every chunk is embedded and stored, so a failed run
+    # never prunes or drops the old model's index
+    if replace:
+        await asyncio.to_thread(_replace_chunks, video_id, held, held_embeddings)
+        counts["removed"] = len(existing)
+    else:
+        counts["removed"] = await asyncio.to_thread(_prune, video_id, existing, seen)
+    # Search structures are built once, not per batch
+    await asyncio.to_thread(backend.finalize, video_id)
+    await asyncio.to_thread(_record_manifest, video_id, seen, model, sample)
+    print(f"Stored chunks for video {video_id}: {counts}")
+    return counts
+
+async def retrieve_relevant_chunks_async(
+    video_id: str,
+    query: str,
+    top_k: int = 5,
+    use_openai_embeddings: bool = True
+) -> List[Dict]:
+    """
+    Async variant of retrieve_relevant_chunks() for request handlers.
+    Concurrent queries share one batched forward pass.
+    """
+    use_openai = await asyncio.to_thread(_query_model, video_id, use_openai_embeddings)
+    query_embedding = (await embed_texts([query], use_openai=use_openai))[0]
+    return await asyncio.to_thread(
+        retrieve_relevant_chunks, video_id, query, top_k, use_openai, query_embedding
     )
-    
-    # Format results
-    chunks = []
-    if results['documents'] and results['documents'][0]:
-        for i, doc in enumerate(results['documents'][0]):
-            chunks.append({
-                'text': doc,
-                'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                'distance': results['distances'][0][i] if results['distances'] else 0
-            })
-    
-    return chunks
+
+async def retrieve_hybrid_chunks_async(
+    video_id: str,
+    query: str,
+    top_k: int = 5,
+    use_openai_embeddings: bool = True,
+    rerank: Optional[bool] = None,
+    query_embedding: Optional[List[float]] = None
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """
+    Async variant of retrieve_hybrid_chunks(); the query is embedded through
+    the micro-batcher. A query_embedding made with the use_openai_embeddings
+    model is reused if the video was indexed with that model.
+    """
+    use_openai = await asyncio.to_thread(_query_model, video_id, use_openai_embeddings)
+    started = time.perf_counter()
+    if query_embedding is None or use_openai != use_openai_embeddings:
+        query_embedding = (await embed_texts([query], use_openai=use_openai))[0]
+    embed_ms = round((time.perf_counter() - started) * 1000, 2)
+    chunks, timings = await asyncio.to_thread(
+        retrieve_hybrid_chunks, video_id, query, top_k, use_openai, query_embedding, rerank
+    )
+    _record_timings({"embed": embed_ms})
+    timings = {"embed": embed_ms, **timings, "total": round(timings["total"] + embed_ms, 2)}
+    return chunks, timings
 
 def delete_video_chunks(video_id: str) -> int:
     """
@@ -123,21 +426,17 @@ def delete_video_chunks(video_id: str) -> int:
     Returns:
         Number of chunks deleted
     """
-    # Get all chunk IDs for this video
-    results = collection.get(
-        where={"video_id": video_id}
-    )
-    
-    if results['ids']:
-        collection.delete(ids=results['ids'])
-        print(f"Deleted {len(results['ids'])} chunks for video {video_id}")
-        return len(results['ids'])
-    
-    return 0
+    deleted = backend.delete(video_id)
+    manifests.delete(video_id)
+    if deleted:
+        _lexical_indexes.invalidate(video_id)
+        print(f"Deleted {deleted} chunks for video {video_id}")
+    return deleted
 
 def get_video_chunk_count(video_id: str) -> int:
-    """Get the number of chunks stored for a video."""
-    results = collection.get(
-        where={"video_id": video_id}
-    )
-    return len(results['ids']) if results['ids'] else 0
+    """Get the number of chunks stored for a video (one manifest lookup)."""
+    manifest = manifests.get(video_id)
+    if manifest is not None:
+        return manifest["chunk_count"]
+    # Indexed before manifests existed: ask the backend
+    return backend.count(video_id)